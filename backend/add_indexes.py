@@ -0,0 +1,31 @@
+from app import app
+from models import db
+from sqlalchemy import inspect
+
+def add_indexes():
+    """Creates any index declared in models.py that the existing database doesn't have yet."""
+    with app.app_context():
+        print(f"Database URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
+        inspector = inspect(db.engine)
+        existing_tables = set(inspector.get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue # db.create_all() builds new tables with their indexes
+            existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                try:
+                    index.create(bind=db.engine)
+                    print(f"Created index {index.name} on {table.name}.")
+                except Exception as e:
+                    print(f"Index {index.name} note: {e}")
+        try:
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql("ANALYZE")
+            print("Statistics updated (ANALYZE).")
+        except Exception as e:
+            print(f"ANALYZE note: {e}")
+
+if __name__ == "__main__":
+    add_indexes()
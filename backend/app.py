@@ -1,26 +1,51 @@
 from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from config import Config
+import os
+from config import config_by_name
 from models import db
 from routes.auth import auth_bp
 from routes.items import items_bp
 from routes.cctv import cctv_bp
+import jobs
+import vector_utils
+import embedding_backends
+import image_preprocess
+import embedding_cache
+import sqlite_tuning
+import query_counter
+import notification_cache
+import notification_stream
 
 app = Flask(__name__)
-app.config.from_object(Config)
+app.config.from_object(config_by_name[os.environ.get('APP_ENV', 'development')])
 
 # Enable CORS
-CORS(app, resources={r"/*": {"origins": "*", "allow_headers": ["Content-Type", "Authorization", "Access-Control-Allow-Credentials"], "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"]}})
+CORS(app, resources={r"/*": {"origins": "*", "allow_headers": ["Content-Type", "Authorization", "Access-Control-Allow-Credentials"], "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"], "expose_headers": ["X-Next-Cursor", "X-Notification-Stream"]}})
 
 # Init extensions
 JWTManager(app)
 db.init_app(app)
+sqlite_tuning.init_app(app)
+jobs.init_app(app)
+notification_stream.init_app(app)
+if app.config.get('QUERY_COUNTER'):
+    query_counter.init_app(app)
 
 # Create tables
 with app.app_context():
     db.create_all()
 
+# Missing packages for EMBED_BACKEND are fatal here, not on the first upload
+embedding_backends.check()
+
+if app.config.get('VECTOR_WARMUP'):
+    try:
+        vector_utils.warm_up()
+    except Exception as e:
+        # Not fatal: the first upload loads whatever is still missing
+        print(f"Vector warm-up failed: {e}")
+
 # Register Blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(items_bp, url_prefix='/api/items')
@@ -30,5 +55,15 @@ app.register_blueprint(cctv_bp, url_prefix='/api/cctv')
 def health():
     return {"status": "ok"}
 
+@app.route('/metrics')
+def metrics():
+    return {
+        "embedding": vector_utils.get_stats(),
+        "embedding_cache": embedding_cache.get_stats(),
+        "image_preprocess": image_preprocess.get_stats(),
+        "notification_cache": notification_cache.get_stats(),
+        "notification_stream": notification_stream.get_stats()
+    }
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
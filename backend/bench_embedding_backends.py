@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+import tempfile
+import numpy as np
+from PIL import Image, ImageDraw
+from config import Config
+import embedding_backends
+
+REFERENCE = 'sentence-transformers'
+
+def fixed_images(n=64, seed=3):
+    """Deterministic photo-sized test images (shapes on noisy backgrounds), used when no image directory is given."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(n):
+        background = rng.integers(0, 255, 3)
+        noise = rng.normal(0, 25, (480, 640, 3))
+        img = Image.fromarray(np.clip(background + noise, 0, 255).astype(np.uint8))
+        draw = ImageDraw.Draw(img)
+        for _ in range(rng.integers(2, 6)):
+            x, y = rng.integers(0, 560), rng.integers(0, 400)
+            w, h = rng.integers(40, 200, 2)
+            shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+            shape([x, y, x + w, y + h], fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+        images.append(img)
+    return images
+
+def load_images(image_dir=None):
+    if not image_dir:
+        return fixed_images()
+    names = sorted(n for n in os.listdir(image_dir) if n.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')))
+    images = []
+    for name in names:
+        with Image.open(os.path.join(image_dir, name)) as img:
+            images.append(img.convert('RGB'))
+    return images
+
+def run_worker(backend, image_dir, out_path):
+    """Runs in a fresh process so peak RSS belongs to this backend alone."""
+    images = load_images(image_dir)
+    start = time.perf_counter()
+    model = embedding_backends.load(backend)
+    load_seconds = time.perf_counter() - start
+    model.encode(images[:2], batch_size=2) # warm-up
+    start = time.perf_counter()
+    vectors = np.asarray(model.encode(images, batch_size=Config.EMBED_BATCH_SIZE), dtype=np.float32)
+    seconds = time.perf_counter() - start
+    np.save(out_path, vectors)
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "images_per_sec": len(images) / seconds,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # KiB on Linux
+    }))
+
+def _normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def compare(reference, vectors):
+    """Agreement with the reference backend: per-image cosine, pairwise-similarity drift, nearest-neighbour match."""
+    ref, vec = _normalize(reference), _normalize(vectors)
+    self_cosine = np.sum(ref * vec, axis=1)
+    ref_pairs, vec_pairs = ref @ ref.T, vec @ vec.T
+    drift = np.abs(ref_pairs - vec_pairs)
+    np.fill_diagonal(ref_pairs, -np.inf)
+    np.fill_diagonal(vec_pairs, -np.inf)
+    top1 = np.mean(ref_pairs.argmax(axis=1) == vec_pairs.argmax(axis=1))
+    return self_cosine.mean(), self_cosine.min(), drift.max(), top1
+
+def _run(*args):
+    return subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *args],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+def bench(backends, image_dir=None):
+    n = len(load_images(image_dir))
+    tmp = tempfile.mkdtemp()
+    results, vectors = {}, {}
+    if any(b.startswith('onnx') for b in backends):
+        # One-off export outside the timed workers, so their RSS is serving memory only
+        _run('--export')
+    for backend in backends:
+        out_path = os.path.join(tmp, f"{backend}.npy")
+        proc = _run('--worker', backend, image_dir or '', out_path)
+        if proc.returncode != 0:
+            print(f"{backend}: failed\n{proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else ''}")
+            continue
+        results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+        vectors[backend] = np.load(out_path)
+
+    threads = Config.EMBED_THREADS or 'default'
+    print(f"{n} images, batch size {Config.EMBED_BATCH_SIZE}, {threads} intra-op threads, reference: {REFERENCE}")
+    print(f"  {'backend':<22} {'img/s':>7} {'load s':>7} {'peak RSS':>9}  {'cos mean':>8} {'cos min':>8} {'pair drift':>10} {'top-1':>6}")
+    for backend, r in results.items():
+        line = f"  {backend:<22} {r['images_per_sec']:7.1f} {r['load_seconds']:7.1f} {r['peak_rss_mb']:7.0f}MB"
+        if REFERENCE in vectors:
+            mean, low, drift, top1 = compare(vectors[REFERENCE], vectors[backend])
+            line += f"  {mean:8.4f} {low:8.4f} {drift:10.4f} {top1:6.2f}"
+        print(line)
+
+if __name__ == "__main__":
+    # Usage: python bench_embedding_backends.py [image_dir] [backend ...]   (EMBED_THREADS=N to pin threads)
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        run_worker(sys.argv[2], sys.argv[3] or None, sys.argv[4])
+    elif len(sys.argv) > 1 and sys.argv[1] == '--export':
+        embedding_backends.export_onnx(quantized=True)
+    else:
+        image_dir = sys.argv[1] if len(sys.argv) > 1 else None
+        bench(sys.argv[2:] or list(embedding_backends.BACKENDS), image_dir)
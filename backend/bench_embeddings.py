@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# Scratch embedding cache, so a repeat run doesn't measure disk hits
+os.environ['EMBED_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(), 'embedding_cache.db')
+import embedding_cache
+import vector_utils
+
+def make_images(n, first=0):
+    """n distinct solid images; passes use different ranges so none is served from the embedding cache."""
+    return [Image.new('RGB', (640, 480), color=(i % 256, i // 256 % 256, i * 53 % 256)) for i in range(first, first + n)]
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {n / elapsed:8.1f} images/sec ({elapsed:.2f}s)")
+
+def bench(n, threads):
+    images = make_images(n)
+    model = vector_utils.get_model()
+    model.encode(images[0]) # warm-up
+
+    timed("one at a time", n, lambda: [model.encode(img) for img in images])
+    bulk = make_images(n, first=n)
+    timed("get_embeddings (bulk)", n, lambda: vector_utils.get_embeddings(bulk))
+    single = make_images(n, first=2 * n)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        timed(f"micro-batched, {threads} threads", n, lambda: list(pool.map(vector_utils.get_embedding, single)))
+    print(f"Stats: {vector_utils.get_stats()}")
+    cache = embedding_cache.get_stats()
+    print(f"Embedding cache: {cache}")
+    assert cache["memory_hits"] + cache["disk_hits"] == 0, "a timed pass was served from the embedding cache"
+
+if __name__ == "__main__":
+    # Usage: python bench_embeddings.py [n_images] [threads]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    bench(n, threads)
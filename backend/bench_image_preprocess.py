@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+import tempfile
+import numpy as np
+from PIL import Image, ImageOps
+from config import Config
+import image_preprocess
+import embedding_backends
+
+THUMB_SIDE = 256
+
+def make_samples(folder, n=12, seed=5):
+    """12 MP phone-sized JPEGs, every other one stored sideways with an EXIF orientation tag."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    for i in range(n):
+        # Smooth gradients plus noise compress like photos rather than like flat colour
+        y, x = np.mgrid[0:3000, 0:4000]
+        base = np.stack([(x * rng.uniform(0.02, 0.06)) % 255, (y * rng.uniform(0.02, 0.06)) % 255, ((x + y) * 0.03) % 255], axis=-1)
+        pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+        img = Image.fromarray(pixels)
+        exif = img.getexif()
+        exif[0x0112] = 6 if i % 2 else 1 # Orientation: rotate 90 CW on display
+        img.save(os.path.join(folder, f"sample_{i:02d}.jpg"), quality=90, exif=exif)
+    return folder
+
+def sample_paths(folder):
+    return [os.path.join(folder, n) for n in sorted(os.listdir(folder)) if n.lower().endswith(('.jpg', '.jpeg'))]
+
+def full_decode(path):
+    """What load_image and ensure_thumbnail did before: decode every pixel, then rotate and convert."""
+    with Image.open(path) as img:
+        img.load()
+        return ImageOps.exif_transpose(img).convert('RGB'), img.width * img.height * len(img.getbands())
+
+# mode -> (one image -> CLIP input or thumbnail, decoded bytes)
+def _embed_full(path):
+    img, decoded = full_decode(path)
+    return embedding_backends.clip_pixels(img), decoded
+
+def _embed_prepared(path):
+    img = image_preprocess.prepare(path, short_side=Config.EMBED_IMAGE_SIZE, max_side=Config.EMBED_IMAGE_MAX_SIDE, purpose='embedding')
+    return embedding_backends.clip_pixels(img), None
+
+def _thumb_full(path):
+    img, decoded = full_decode(path)
+    img.thumbnail((THUMB_SIDE, THUMB_SIDE))
+    return np.asarray(img), decoded
+
+def _thumb_prepared(path):
+    return np.asarray(image_preprocess.prepare(path, max_side=THUMB_SIDE, purpose='thumbnail')), None
+
+MODES = {
+    "embedding, full decode": _embed_full,
+    "embedding, prepare()": _embed_prepared,
+    "thumbnail, full decode": _thumb_full,
+    "thumbnail, prepare()": _thumb_prepared,
+}
+
+def run_worker(mode, folder, out_path):
+    """One mode per process so peak RSS isn't inherited from a previous mode."""
+    paths = sample_paths(folder)
+    fn = MODES[mode]
+    fn(paths[0]) # warm-up (codec init)
+    image_preprocess._stats.clear()
+    latencies, decoded, outputs = [], [], []
+    for path in paths:
+        start = time.perf_counter()
+        output, decoded_bytes = fn(path)
+        latencies.append(time.perf_counter() - start)
+        decoded.append(decoded_bytes)
+        outputs.append(output)
+    stats = image_preprocess.get_stats()
+    if decoded[0] is None:
+        decoded = [next(iter(stats.values()))["avg_decoded_kb"] * 1024]
+    np.save(out_path, np.stack(outputs) if mode.startswith('embedding') else np.array(outputs, dtype=object), allow_pickle=True)
+    print(json.dumps({
+        "p50_ms": float(np.median(latencies) * 1000),
+        "mean_ms": float(np.mean(latencies) * 1000),
+        "decoded_mb": float(np.mean(decoded) / 1024 / 1024),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # KiB on Linux
+    }))
+
+def _run(*args):
+    return subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *args],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+def bench(folder):
+    paths = sample_paths(folder)
+    with Image.open(paths[0]) as img:
+        print(f"{len(paths)} JPEGs in {folder} (first is {img.width}x{img.height}), embedding side {Config.EMBED_IMAGE_SIZE}, thumbnail side {THUMB_SIDE}")
+    tmp = tempfile.mkdtemp()
+    results, outputs = {}, {}
+    for mode in MODES:
+        out_path = os.path.join(tmp, f"{len(results)}.npy")
+        proc = _run('--worker', mode, folder, out_path)
+        if proc.returncode != 0:
+            print(f"{mode}: failed\n{proc.stderr}")
+            continue
+        results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+        outputs[mode] = np.load(out_path, allow_pickle=True)
+
+    print(f"  {'mode':<24} {'p50 ms':>7} {'mean ms':>8} {'decoded':>9} {'peak RSS':>9}  {'vs full decode':>14}")
+    for mode, r in results.items():
+        line = f"  {mode:<24} {r['p50_ms']:7.1f} {r['mean_ms']:8.1f} {r['decoded_mb']:7.1f}MB {r['peak_rss_mb']:7.0f}MB"
+        reference = mode.split(',')[0] + ", full decode"
+        if mode != reference and reference in outputs:
+            # Mean absolute difference per pixel: CLIP-normalized units for embeddings, 0-255 for thumbnails
+            diffs = [np.abs(a.astype(np.float32) - b.astype(np.float32)).mean()
+                     for a, b in zip(outputs[reference], outputs[mode]) if a.shape == b.shape]
+            line += f"  {np.mean(diffs):14.4f}" if len(diffs) == len(outputs[mode]) else "  (sizes differ)"
+        print(line)
+
+if __name__ == "__main__":
+    # Usage: python bench_image_preprocess.py [jpeg_dir]   (without a directory, 12 MP samples are generated)
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        run_worker(sys.argv[2], sys.argv[3], sys.argv[4])
+    elif len(sys.argv) > 1 and sys.argv[1] == '--make-samples':
+        make_samples(sys.argv[2])
+    else:
+        if len(sys.argv) > 1:
+            folder = sys.argv[1]
+        else:
+            # In a child process: Linux carries peak RSS across exec, and generating samples is memory hungry
+            folder = os.path.join(tempfile.mkdtemp(), 'samples')
+            _run('--make-samples', folder)
+        bench(folder)
@@ -0,0 +1,89 @@
+import os
+import sys
+import random
+import tempfile
+import time
+from datetime import date, timedelta, time as dtime
+from sqlalchemy import create_engine, select, and_
+from models import db, User, LostItem, FoundItem, CCTVRequest, Match
+
+CATEGORIES = ['Electronics', 'Bags', 'Keys', 'Wallets', 'Clothing', 'Books', 'ID Cards', 'Other']
+
+def seed(engine, n):
+    """Inserts n lost items, n found items, n/10 CCTV requests and n matches spread over 200 users."""
+    rng = random.Random(42)
+    start = date(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": u, "username": f"user{u}", "email": f"user{u}@example.com", "password_hash": "x"} for u in range(1, 201)
+        ])
+        lost, found = [], []
+        for i in range(1, n + 1):
+            d = start + timedelta(days=rng.randint(0, 365))
+            lost.append({"id": i, "category": rng.choice(CATEGORIES), "name": f"item {i}", "description": "black bag",
+                         "color": "black", "date_lost": d, "location": "Library", "owner_name": "o", "email": "e",
+                         "phone": "p", "images": [], "user_id": rng.randint(1, 200), "status": "lost"})
+            found.append({"id": i, "category": rng.choice(CATEGORIES), "description": "black bag", "color": "black",
+                          "date_found": d, "location_found": "Library", "finder_name": "f", "contact": "c",
+                          "images": [], "user_id": rng.randint(1, 200), "status": "found"})
+        conn.execute(LostItem.__table__.insert(), lost)
+        conn.execute(FoundItem.__table__.insert(), found)
+        conn.execute(CCTVRequest.__table__.insert(), [
+            {"location": "Gate", "date_request": start, "start_time": dtime(9, 0), "end_time": dtime(10, 0), "user_id": rng.randint(1, 200)}
+            for _ in range(max(1, n // 10))
+        ])
+        conn.execute(Match.__table__.insert(), [
+            {"lost_id": i, "found_id": rng.randint(1, n), "text_score": 2, "method": "text"} for i in range(1, n + 1)
+        ])
+
+def hot_queries():
+    user_id = 7
+    return {
+        "my lost items": select(LostItem.id).where(LostItem.user_id == user_id),
+        "lost->found candidates": select(FoundItem.id).where(and_(
+            FoundItem.category == 'Bags', FoundItem.date_found >= date(2025, 6, 1))),
+        "found->lost candidates": select(LostItem.id).where(and_(
+            LostItem.category == 'Bags', LostItem.date_lost <= date(2025, 6, 1))),
+        "notifications": select(Match.id).join(LostItem, Match.lost_id == LostItem.id).where(
+            LostItem.user_id == user_id).order_by(Match.id.desc()).limit(50),
+        "list found (newest)": select(FoundItem.id).order_by(FoundItem.created_at.desc(), FoundItem.id.desc()).limit(50),
+        "my cctv requests": select(CCTVRequest.id).where(CCTVRequest.user_id == user_id).order_by(
+            CCTVRequest.created_at.desc()),
+    }
+
+def run(engine, label, repeats=50):
+    print(f"\n== {label} ==")
+    with engine.connect() as conn:
+        for name, query in hot_queries().items():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = " | ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+            start = time.perf_counter()
+            for _ in range(repeats):
+                conn.execute(query).fetchall()
+            ms = (time.perf_counter() - start) * 1000 / repeats
+            print(f"{name:<26} {ms:8.3f} ms  {plan}")
+
+def bench(n):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    seed(engine, n)
+
+    # Drop every secondary index declared in models.py to get the "before" numbers
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+        conn.exec_driver_sql("ANALYZE")
+    run(engine, f"without indexes, {n} rows")
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn)
+        conn.exec_driver_sql("ANALYZE")
+    run(engine, f"with indexes, {n} rows")
+
+if __name__ == "__main__":
+    # Usage: python bench_indexes.py [n_rows]
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,75 @@
+import random
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+from matching import text_score
+from match_engine import Corpus, Features
+
+COLORS = ['black', 'white', 'red', 'blue', 'navy blue', 'dark red', 'grey', 'silver', 'gold', 'green']
+LOCATIONS = ['Main Library', 'Library', 'Gym', 'Cafeteria', 'Block A', 'Block A Room 101', 'Parking Lot', 'Hostel']
+WORDS = ['black', 'leather', 'wallet', 'phone', 'with', 'the', 'cracked', 'screen', 'blue', 'bag', 'keys',
+         'a', 'my', 'card', 'inside', 'sticker', 'cover', 'case', 'small', 'large', 'id', 'bottle']
+
+def random_color(rng):
+    # Mix of single colors, comma lists (some with stray spaces/trailing commas) and blanks
+    choice = rng.random()
+    if choice < 0.05:
+        return ''
+    if choice < 0.6:
+        return rng.choice(COLORS)
+    colors = rng.sample(COLORS, rng.randint(2, 3))
+    return (', ' if rng.random() < 0.5 else ',').join(colors) + (',' if rng.random() < 0.1 else '')
+
+def random_item(rng, start):
+    return SimpleNamespace(
+        color=random_color(rng),
+        location=rng.choice(LOCATIONS).upper() if rng.random() < 0.1 else rng.choice(LOCATIONS),
+        description=' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 12))),
+        day=start + timedelta(days=rng.randint(0, 60))
+    )
+
+def bench(n_found, n_lost):
+    rng = random.Random(7)
+    start = date(2026, 1, 1)
+    found = [random_item(rng, start) for _ in range(n_found)]
+    for f in found:
+        f.location_found = f.location
+    lost = [random_item(rng, start) for _ in range(n_lost)]
+
+    t0 = time.perf_counter()
+    corpus = Corpus()
+    for i, f in enumerate(found):
+        corpus.add(i, Features(f.color, f.location_found, f.description, f.day))
+    corpus.arrays()
+    build = time.perf_counter() - t0
+
+    # Adding any row invalidates the column arrays, so a query after new reports pays for a full rebuild
+    t0 = time.perf_counter()
+    corpus._build()
+    rebuild = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    expected = [[text_score(l, f) for f in found] for l in lost]
+    loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    actual = [corpus.score(Features(l.color, l.location, l.description, l.day))[1].tolist() for l in lost]
+    engine = time.perf_counter() - t0
+
+    mismatches = sum(1 for e, a in zip(expected, actual) for x, y in zip(e, a) if x != y)
+    print(f"{n_found} found items, {n_lost} lost queries")
+    print(f"  python double loop: {loop * 1000 / n_lost:8.2f} ms per lost item")
+    print(f"  vectorized engine:  {engine * 1000 / n_lost:8.2f} ms per lost item ({loop / engine:.1f}x faster), arrays already built")
+    print(f"  + array rebuild:    {(engine / n_lost + rebuild) * 1000:8.2f} ms per lost item ({loop / n_lost / (engine / n_lost + rebuild):.1f}x), "
+          f"when rows were added since the last query")
+    print(f"  tokenize + build from scratch: {build * 1000:.1f} ms")
+    print("  Both paths are linear in the number of items scored; the engine only lowers the constant.")
+    print(f"  score mismatches: {mismatches}")
+    assert mismatches == 0, "Engine scores differ from matching.text_score"
+
+if __name__ == "__main__":
+    # Usage: python bench_match_engine.py [n_found] [n_lost]
+    n_found = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    n_lost = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    bench(n_found, n_lost)
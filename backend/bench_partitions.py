@@ -0,0 +1,63 @@
+import sys
+import time
+import tempfile
+import numpy as np
+import chromadb
+from vector_store import ChromaStore, LocalStore, vector_id
+from bench_vector_store import make_vectors, exact_top_k
+
+# Skewed like real reports: a few big categories and a long tail of small ones
+CATEGORY_WEIGHTS = {'Electronics': 30, 'Bags': 20, 'Wallets': 15, 'Keys': 12, 'Documents': 10,
+                    'Clothing': 8, 'Jewelry': 3, 'Umbrellas': 1, 'Instruments': 0.6, 'Medical': 0.4}
+
+def bench(store_name, n, n_queries=300, k=5):
+    rng = np.random.default_rng(11)
+    names = list(CATEGORY_WEIGHTS)
+    weights = np.array(list(CATEGORY_WEIGHTS.values()), dtype=float)
+    vectors = make_vectors(rng, n)
+    categories = np.array(rng.choice(names, n, p=weights / weights.sum()), dtype=object)
+    queries = make_vectors(rng, n_queries)
+    # Queries spread evenly over categories so the small ones are measured too
+    query_categories = [names[i % len(names)] for i in range(n_queries)]
+    truth = [exact_top_k(vectors, categories, q, c, k) for q, c in zip(queries, query_categories)]
+
+    tmp = tempfile.mkdtemp()
+    if store_name == 'chroma':
+        client = chromadb.PersistentClient(path=f"{tmp}/chroma")
+        store = ChromaStore(lambda: client)
+    else:
+        store = LocalStore(f"{tmp}/local")
+    ids = [vector_id(i, 0) for i in range(n)]
+    metadatas = [{"category": c, "item_id": i} for i, c in enumerate(categories)]
+    for start in range(0, n, 1000):
+        end = start + 1000
+        store.upsert("single", ids[start:end], vectors[start:end].tolist(), metadatas[start:end])
+    for category in names:
+        rows = np.flatnonzero(categories == category)
+        for start in range(0, len(rows), 1000):
+            chunk = rows[start:start + 1000]
+            store.upsert(f"part__{category}", [ids[i] for i in chunk], vectors[chunk].tolist(), [metadatas[i] for i in chunk])
+
+    print(f"{store_name}: {n} vectors, {n_queries} queries, top-{k} within category")
+    for label, run in (
+        ("single + where", lambda q, c: store.query("single", [q], k, where={"category": c})[0]),
+        ("per-category", lambda q, c: store.query(f"part__{c}", [q], k)[0]),
+    ):
+        latencies, recall, returned = [], [], []
+        for query, category, expected in zip(queries.tolist(), query_categories, truth):
+            t0 = time.perf_counter()
+            hits = run(query, category)
+            latencies.append(time.perf_counter() - t0)
+            got = {int(vid.split(':')[0]) for vid, _, _ in hits}
+            returned.append(len(got))
+            recall.append(len(got & expected) / len(expected))
+        latencies = np.array(latencies) * 1000
+        print(f"  {label:<15} p50 {np.percentile(latencies, 50):6.2f} ms  p95 {np.percentile(latencies, 95):6.2f} ms"
+              f"  recall@{k} {np.mean(recall):.4f}  hits returned {np.mean(returned):.2f}/{k}")
+
+if __name__ == "__main__":
+    # Usage: python bench_partitions.py [chroma|local] [n_vectors] [n_queries]
+    store_name = sys.argv[1] if len(sys.argv) > 1 else 'chroma'
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    n_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+    bench(store_name, n, n_queries)
@@ -0,0 +1,180 @@
+import os
+import sys
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+import numpy as np
+
+# Everything goes to a scratch directory: SQLite database, local vector index, caches
+_tmp = tempfile.mkdtemp()
+os.environ.update(JOB_WORKERS='0', VECTOR_STORE='local', VECTOR_STORE_PATH=os.path.join(_tmp, 'vectors'),
+                  EMBED_CACHE_PATH=os.path.join(_tmp, 'embedding_cache.db'))
+from config import Config
+Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+
+from app import app
+from flask_jwt_extended import create_access_token
+from models import db, User, LostItem, FoundItem, Match
+from bench_match_engine import random_color, LOCATIONS, WORDS
+import jobs
+import matching
+import notification_cache
+import ranker
+import text_index
+import vector_utils
+
+CATEGORIES = ['Electronics', 'Bags', 'Wallets', 'Keys']
+DIM = 512
+START = date(2026, 1, 1)
+
+def unit(v):
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+class Vectors:
+    """Clustered random vectors: items of one cluster look alike, so ANN searches return real hits."""
+
+    def __init__(self, rng, n_clusters=200):
+        self.rng = rng
+        self.centers = unit(rng.standard_normal((n_clusters, DIM)))
+
+    def near(self, cluster, noise):
+        return unit(self.centers[cluster] + noise * self.rng.standard_normal(DIM) / np.sqrt(DIM)).astype(np.float32)
+
+def random_fields(rng):
+    return {
+        "color": random_color(rng),
+        "description": ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 12))),
+    }
+
+def seed(n_found, n_lost, n_users=50):
+    """
+    n_found found items, n_lost lost items of user 1 (the heavy user) and as many again spread over the others,
+    with an image and a text vector each. Returns {(item_type, id): (image vector, text vector)}.
+    """
+    rng = random.Random(3)
+    vectors = Vectors(np.random.default_rng(3))
+    db.session.execute(User.__table__.insert(), [
+        {"id": u, "username": f"user{u}", "email": f"user{u}@example.com", "password_hash": "x"} for u in range(1, n_users + 1)
+    ])
+    found, lost, clusters = [], [], {}
+    for i in range(1, n_found + 1):
+        found.append({"id": i, "category": rng.choice(CATEGORIES), "location_found": rng.choice(LOCATIONS),
+                      "date_found": START + timedelta(days=rng.randint(0, 120)), "finder_name": "f", "contact": "c",
+                      "images": [], "user_id": rng.randint(2, n_users), "status": "found", **random_fields(rng)})
+        clusters[('found', i)] = rng.randrange(len(vectors.centers))
+    for i in range(1, 2 * n_lost + 1):
+        lost.append({"id": i, "category": rng.choice(CATEGORIES), "name": f"item {i}", "location": rng.choice(LOCATIONS),
+                     "date_lost": START + timedelta(days=rng.randint(0, 60)), "owner_name": "o", "email": "e", "phone": "p",
+                     "images": [], "user_id": 1 if i <= n_lost else rng.randint(2, n_users), "status": "lost",
+                     **random_fields(rng)})
+        clusters[('lost', i)] = rng.randrange(len(vectors.centers))
+    db.session.execute(FoundItem.__table__.insert(), found)
+    db.session.execute(LostItem.__table__.insert(), lost)
+    db.session.commit()
+    text_index.rebuild('found')
+    text_index.rebuild('lost')
+
+    store = vector_utils.get_store()
+    queries = {}
+    for model, item_type, image_base, text_base in ((FoundItem, 'found', "found_items", "found_text"),
+                                                    (LostItem, 'lost', "lost_items", "lost_text")):
+        batches = {}
+        for item in model.query.all():
+            cluster = clusters[(item_type, item.id)]
+            image, text = vectors.near(cluster, 0.8), vectors.near(cluster, 0.3)
+            queries[(item_type, item.id)] = (image, text)
+            metadata = jobs.vector_metadata(item)
+            for base, vector in ((image_base, image), (text_base, text)):
+                batch = batches.setdefault(vector_utils.partition_name(base, metadata), ([], [], []))
+                batch[0].append(vector_utils.vector_id(item.id, 0))
+                batch[1].append(vector.tolist())
+                batch[2].append(metadata)
+        for partition, (ids, embeddings, metadatas) in batches.items():
+            for start in range(0, len(ids), 1000):
+                store.upsert(partition, ids[start:start + 1000], embeddings[start:start + 1000], metadatas[start:start + 1000])
+    return queries
+
+def percentiles(seconds):
+    ms = np.array(seconds) * 1000
+    return f"p50 {np.percentile(ms, 50):7.2f} ms  p95 {np.percentile(ms, 95):7.2f} ms"
+
+def bench_merge(n_rows=2000, n_hits=60, repeats=200):
+    """The merge step alone: vector hits joined onto text results by a linear search vs one dict lookup each."""
+    rng = random.Random(5)
+    rows = [{"id": i, "score": rng.randint(0, 7)} for i in range(n_rows)]
+    hits = {rng.randrange(n_rows): 0.9 for _ in range(n_hits)}
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for item_id, similarity in hits.items():
+            row = next((r for r in rows if r["id"] == item_id), None)
+            if row is not None:
+                row["vector_score"] = similarity
+    linear = (time.perf_counter() - t0) / repeats
+    candidates = ranker.Candidates(START)
+    candidates.add_text(np.arange(n_rows), {name: np.ones(n_rows, dtype=np.int64) for name in ranker.TEXT_FEATURES})
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        candidates.add("vector", hits)
+    merged = (time.perf_counter() - t0) / repeats
+    print(f"merge of {n_hits} vector hits into {n_rows} text candidates: linear next() {linear * 1000:.3f} ms, "
+          f"Candidates.add {merged * 1000:.3f} ms ({linear / merged:.0f}x)")
+
+def bench(n_found, n_lost, n_new_found=100):
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        queries = seed(n_found, n_lost)
+        print(f"{n_found} found items, user 1 has {n_lost} lost items (+{n_lost} for other users), "
+              f"seeded in {time.perf_counter() - t0:.1f}s")
+        bench_merge()
+        token = create_access_token(identity="1")
+        client = app.test_client()
+        user_lost = LostItem.query.filter_by(user_id=1).order_by(LostItem.id).all()
+        all_lost = LostItem.query.order_by(LostItem.id).all()
+        new_found = FoundItem.query.order_by(FoundItem.id.desc()).limit(n_new_found).all()
+
+        for k in (0, 20):
+            Config.MATCH_TOP_K = k
+            Match.query.delete()
+            db.session.commit()
+
+            # Reporting side: every lost item ranked against the found items (build_matches.py path)
+            lost_times = []
+            for lost in all_lost:
+                image, text = queries[('lost', lost.id)]
+                t0 = time.perf_counter()
+                matching.match_lost_item(lost, query_embeddings=[image.tolist()], text_embedding=text.tolist())
+                if lost.user_id == 1:
+                    lost_times.append(time.perf_counter() - t0)
+
+            # Ingest side: new found items ranked against open lost items, evicting from full top-k lists
+            found_times = []
+            for found in new_found:
+                image, text = queries[('found', found.id)]
+                t0 = time.perf_counter()
+                matching.match_found_item(found, query_embeddings=[image.tolist()], text_embedding=text.tolist())
+                found_times.append(time.perf_counter() - t0)
+
+            user_rows = Match.query.join(LostItem, Match.lost_id == LostItem.id).filter(LostItem.user_id == 1).count()
+            notification_times = []
+            for _ in range(30):
+                notification_cache.invalidate_users([1])
+                t0 = time.perf_counter()
+                response = client.get('/api/items/notifications?limit=50', headers={"Authorization": f"Bearer {token}"})
+                notification_times.append(time.perf_counter() - t0)
+                assert response.status_code == 200
+
+            label = f"top-{k}" if k else "unbounded"
+            print(f"\n== {label} ==")
+            print(f"  match_lost_item  {percentiles(lost_times)}")
+            print(f"  match_found_item {percentiles(found_times)}")
+            print(f"  matches: {Match.query.count()} total, {user_rows} for user 1 "
+                  f"({user_rows / len(user_lost):.1f} per lost item)")
+            print(f"  GET /notifications (uncached, 50 rows) {percentiles(notification_times)}")
+
+if __name__ == "__main__":
+    # Usage: python bench_ranker.py [n_found] [n_lost_for_user]
+    n_found = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_lost = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    bench(n_found, n_lost)
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from config import Config, ProductionConfig
+from models import db, User, FoundItem
+from sqlite_tuning import register_pragmas
+
+def make_engine(profile, path):
+    engine = create_engine(f"sqlite:///{path}", **getattr(profile, 'SQLALCHEMY_ENGINE_OPTIONS', {}))
+    register_pragmas(engine, profile.SQLITE_PRAGMAS)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": 1, "username": "u", "email": "u@example.com", "password_hash": "x"}])
+    return engine
+
+def found_row():
+    return {"category": "Bags", "description": "black bag", "color": "black", "date_found": date(2026, 1, 1),
+            "location_found": "Library", "finder_name": "f", "contact": "c", "images": [], "user_id": 1}
+
+def load_test(profile, seconds, readers, writers, hold_ms):
+    engine = make_engine(profile, os.path.join(tempfile.mkdtemp(), 'load.db'))
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+    listing = select(FoundItem.id).order_by(FoundItem.created_at.desc(), FoundItem.id.desc()).limit(50)
+
+    def reader():
+        while time.monotonic() < stop:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(listing).fetchall()
+                key = "reads"
+            except OperationalError:
+                key = "locked"
+            with lock:
+                counts[key] += 1
+
+    def writer():
+        while time.monotonic() < stop:
+            try:
+                # Hold the write transaction open, like a request that writes and then does slow work
+                with engine.begin() as conn:
+                    conn.execute(FoundItem.__table__.insert(), [found_row()])
+                    time.sleep(hold_ms / 1000)
+                key = "writes"
+            except OperationalError:
+                key = "locked"
+            with lock:
+                counts[key] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    print(f"{profile.__name__:<18} reads/s={counts['reads'] / seconds:8.1f}  writes/s={counts['writes'] / seconds:6.1f}  "
+          f"locked errors={counts['locked']}")
+
+if __name__ == "__main__":
+    # Usage: python bench_sqlite_concurrency.py [seconds] [readers] [writers] [hold_ms]
+    args = [float(a) for a in sys.argv[1:]]
+    seconds, readers, writers, hold_ms = (args + [5, 8, 2, 50][len(args):])[:4]
+    print(f"{int(readers)} readers, {int(writers)} writers holding each write transaction {hold_ms:.0f}ms, {seconds:.0f}s per profile")
+    for profile in (Config, ProductionConfig):
+        load_test(profile, seconds, int(readers), int(writers), hold_ms)
@@ -0,0 +1,32 @@
+import os
+import sys
+import time
+import subprocess
+
+MODULES = ["app", "promote_admin", "debug_db", "clear_users", "build_matches"]
+HEAVY = ("torch", "chromadb", "sentence_transformers")
+
+def measure(module, runs):
+    """Best-of-N wall time of a fresh interpreter importing module, and which heavy packages it pulled in."""
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    # In-memory database, no worker threads: only import and app setup are timed
+    env = dict(os.environ, APP_ENV="testing")
+    best, heavy = None, ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+        heavy = result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ""
+        best = elapsed if best is None else min(best, elapsed)
+    return best, heavy
+
+if __name__ == "__main__":
+    # Usage: python bench_startup.py [runs]
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"Cold start, best of {runs} (APP_ENV=testing)")
+    for module in MODULES:
+        seconds, heavy = measure(module, runs)
+        print(f"  import {module:<15} {seconds:6.2f}s   heavy modules loaded: {heavy or 'none'}")
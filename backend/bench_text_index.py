@@ -0,0 +1,137 @@
+import os
+import sys
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+from datetime import date, timedelta
+import numpy as np
+
+_tmp = tempfile.mkdtemp()
+os.environ.update(JOB_WORKERS='0')
+from config import Config
+Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+
+from app import app
+from models import db, User, FoundItem
+from bench_match_engine import random_color
+from matching import TEXT_THRESHOLD
+from match_engine import Corpus, Features
+import match_engine
+import text_index
+
+CATEGORIES = ['Electronics', 'Bags', 'Wallets', 'Keys', 'Documents', 'Clothing']
+START = date(2024, 1, 1)
+DAYS = 3 * 365 # found items accumulate over the years
+RECENT = 60 # lost reports are about the last two months
+
+class Vocabulary:
+    """Zipf-distributed words, so a few are common and most are rare, like real descriptions."""
+
+    def __init__(self, rng, size=5000):
+        self.rng = rng
+        self.words = [f"w{i}" for i in range(size)]
+        weights = 1.0 / np.arange(1, size + 1)
+        self.cumulative = np.cumsum(weights / weights.sum())
+
+    def sample(self, n):
+        return [self.words[min(int(np.searchsorted(self.cumulative, self.rng.random())), len(self.words) - 1)] for _ in range(n)]
+
+def random_item(rng, vocabulary, palette=None, first_day=0):
+    """
+    palette: colors to pick one from; None mixes bench_match_engine's ten colors into lists.
+    first_day: earliest day (offset from START) the item can be dated
+    """
+    return {
+        "category": rng.choice(CATEGORIES),
+        "color": rng.choice(palette) if palette else random_color(rng),
+        "location": f"Block {rng.randint(1, 40)} Room {rng.randint(1, 300)}",
+        "description": ' '.join(vocabulary.sample(rng.randint(3, 12))),
+        "day": START + timedelta(days=rng.randint(first_day, DAYS)),
+    }
+
+def seed(n, rng, vocabulary, palette):
+    db.session.execute(User.__table__.insert(), [{"id": 1, "username": "u", "email": "u@example.com", "password_hash": "x"}])
+    rows = []
+    for i in range(1, n + 1):
+        item = random_item(rng, vocabulary, palette)
+        rows.append({"id": i, "category": item["category"], "description": item["description"], "color": item["color"],
+                     "date_found": item["day"], "location_found": item["location"], "finder_name": "f", "contact": "c",
+                     "images": [], "user_id": 1, "status": "found"})
+    for start in range(0, n, 5000):
+        db.session.execute(FoundItem.__table__.insert(), rows[start:start + 5000])
+    db.session.commit()
+    return text_index.rebuild('found')
+
+def full_scan_corpora():
+    """What match_engine kept before the index: one corpus of every found item per category."""
+    corpora = {}
+    for item_id, category, color, location, description, day in db.session.query(
+        FoundItem.id, FoundItem.category, FoundItem.color, FoundItem.location_found, FoundItem.description, FoundItem.date_found
+    ).order_by(FoundItem.id):
+        corpora.setdefault(category, Corpus()).add(item_id, Features(color, location, description, day))
+    for corpus in corpora.values():
+        corpus.arrays()
+    return corpora
+
+def bench(sizes, n_queries=100):
+    # Any shared color is already a text match (2 points), so the palette sets how many matches a report has
+    scenarios = (("10 colors, color lists", None), ("300 colors", [f"shade{i}" for i in range(300)]))
+    with app.app_context():
+        print(f"Found items over {DAYS} days, {n_queries} lost reports from the last {RECENT} days per run, "
+              "matched against items found on or after the lost date")
+        for n in sizes:
+            for label, palette in scenarios:
+                rng = random.Random(9)
+                vocabulary = Vocabulary(rng)
+                db.drop_all()
+                db.create_all()
+                match_engine.clear()
+                t0 = time.perf_counter()
+                _, postings = seed(n, rng, vocabulary, palette)
+                seeded = time.perf_counter() - t0
+                corpora = full_scan_corpora()
+                queries = []
+                for _ in range(n_queries):
+                    item = random_item(rng, vocabulary, palette, first_day=DAYS - RECENT)
+                    queries.append(SimpleNamespace(date_lost=item["day"], **item))
+
+                scan_times, index_times, candidates, matches = [], [], [], []
+                missed = missed_matches = 0
+                for lost in queries:
+                    query = Features(lost.color, lost.location, lost.description, lost.date_lost)
+                    t0 = time.perf_counter()
+                    # Before: staleness check over the category's ids, then every item scored
+                    current = {row[0] for row in db.session.query(FoundItem.id).filter(FoundItem.category == lost.category)}
+                    assert len(current) == len(corpora[lost.category])
+                    ids, features = corpora[lost.category].features(query, min_day=query.day)
+                    scan_times.append(time.perf_counter() - t0)
+                    expected = points(ids, features)
+
+                    t0 = time.perf_counter()
+                    ids, features = match_engine.features_lost(lost)
+                    index_times.append(time.perf_counter() - t0)
+                    got = points(ids, features)
+                    candidates.append(len(ids))
+                    matches.append(sum(1 for p in expected.values() if p >= TEXT_THRESHOLD))
+                    assert all(expected[i] == p for i, p in got.items())
+                    for i in expected.keys() - got.keys():
+                        missed += 1
+                        missed_matches += expected[i] >= TEXT_THRESHOLD
+
+                scan, index = np.median(scan_times) * 1000, np.median(index_times) * 1000
+                print(f"\n{n} found items, {label} ({postings} postings, seeded + indexed in {seeded:.1f}s)")
+                print(f"  full category scan  p50 {scan:8.2f} ms")
+                print(f"  text index          p50 {index:8.2f} ms  ({scan / index:.1f}x)  "
+                      f"{np.mean(candidates):.0f} candidates for {np.mean(matches):.0f} text matches per query")
+                print(f"  pairs with text points not found (substring inside a word, empty color entry): {missed}, {missed_matches} of them matches")
+
+def points(ids, features):
+    """{id: text points} of the items with any."""
+    total = features["color"] + features["location"] + features["description"]
+    return {i: p for i, p in zip(ids.tolist(), total.tolist()) if p}
+
+if __name__ == "__main__":
+    # Usage: python bench_text_index.py [n_found ...]
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 50000, 200000]
+    bench(sizes)
@@ -0,0 +1,55 @@
+import requests
+import base64
+import io
+import sys
+import time
+from PIL import Image
+
+BASE_URL = "http://127.0.0.1:5001/api"
+
+def get_token():
+    login_data = {"email": "testuser@example.com", "password": "testpassword"}
+    res = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    return res.json().get('token')
+
+def make_image(i):
+    # Vary the color so every upload is a distinct image
+    img = Image.new('RGB', (640, 480), color=(i * 37 % 256, i * 91 % 256, i * 53 % 256))
+    buffered = io.BytesIO()
+    img.save(buffered, format="JPEG")
+    return f"data:image/jpeg;base64,{base64.b64encode(buffered.getvalue()).decode()}"
+
+def percentile(values, p):
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+def bench_uploads(token, n):
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    for i in range(n):
+        payload = {
+            "category": "Electronics",
+            "description": f"Benchmark upload {i}",
+            "color": "red",
+            "dateFound": "2026-03-05",
+            "locationFound": "Main Library",
+            "finderName": "Bench",
+            "contact": "bench@example.com",
+            "images": [make_image(i)]
+        }
+        start = time.perf_counter()
+        res = requests.post(f"{BASE_URL}/items/found", json=payload, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if res.status_code not in (201, 202):
+            print(f"Upload {i}: FAILED - {res.status_code} - {res.text}")
+            return
+
+    print(f"{n} uploads: p50={percentile(latencies, 50):.1f}ms p99={percentile(latencies, 99):.1f}ms max={max(latencies):.1f}ms")
+
+if __name__ == "__main__":
+    # Usage: python bench_upload.py [n]  (server must be running, run test_auth.py first)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    t = get_token()
+    if t:
+        bench_uploads(t, n)
@@ -0,0 +1,63 @@
+import sys
+import time
+import tempfile
+import threading
+import numpy as np
+import chromadb
+import vector_utils
+
+def timed(n, fn, before=None):
+    fn()
+    total = 0.0
+    for _ in range(n):
+        if before:
+            before()
+        start = time.perf_counter()
+        fn()
+        total += time.perf_counter() - start
+    return total / n * 1e6
+
+def bench(n_items=250, n=300):
+    """
+    Per-call cost of the vector layer with cached collection handles vs. reopening them every call
+    (what get_or_create_collection on each add/search/fetch used to cost). Uses a throwaway Chroma
+    store and a stand-in model, so it measures only the layer's overhead, not CLIP.
+    """
+    client = chromadb.PersistentClient(path=tempfile.mkdtemp())
+    vector_utils._session._client = client
+    vector_utils._session._model = object()
+    store = vector_utils.get_store()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(n_items * 4, 512)).tolist()
+    for i in range(n_items):
+        vector_utils.add_item_vectors("found_items", i, vectors[i * 4:i * 4 + 4], {"category": "AB"[i % 2]})
+
+    calls = {
+        "get_item_embeddings": lambda: vector_utils.get_item_embeddings("found_items", [4]),
+        "search_items": lambda: vector_utils.search_items("found_items", vectors[:2], 5, where={"category": "A"}),
+    }
+    print(f"{n_items * 4} vectors, {n} calls each (microseconds per call)")
+    reference = timed(n, lambda: client.get_or_create_collection("found_items", metadata={"hnsw:space": "cosine"}))
+    print(f"  one get_or_create_collection: {reference:.1f}")
+    print(f"  {'':<26} {'reopen handles':>15} {'cached':>10}")
+    for label, fn in calls.items():
+        reopened = timed(n, fn, before=store.forget)
+        cached = timed(n, fn)
+        print(f"  {label:<26} {reopened:15.1f} {cached:10.1f}")
+
+    # Already-initialized getters no longer take a lock
+    def hammer():
+        for _ in range(50000):
+            vector_utils.get_model()
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"  get_model(), 8 threads: {(time.perf_counter() - start) / 400000 * 1e6:.2f} us per call")
+
+if __name__ == "__main__":
+    # Usage: python bench_vector_overhead.py [n_items] [n_calls]
+    bench(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,58 @@
+import sys
+import time
+import tempfile
+import numpy as np
+import chromadb
+from vector_store import ChromaStore, LocalStore, vector_id
+
+CATEGORIES = ['Electronics', 'Bags', 'Keys', 'Wallets', 'Documents', 'Clothing', 'Jewelry', 'Other']
+
+def make_vectors(rng, n, dim=512, clusters=200):
+    """CLIP-like data: unit vectors scattered around cluster centres, so neighbours are close but not identical."""
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + rng.normal(scale=0.6, size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def exact_top_k(vectors, categories, query, category, k):
+    candidates = np.flatnonzero(categories == category)
+    sims = vectors[candidates] @ query
+    return {int(i) for i in candidates[np.argsort(-sims)[:k]]}
+
+def bench(n, n_queries=200, k=15):
+    rng = np.random.default_rng(7)
+    vectors = make_vectors(rng, n)
+    categories = np.array([CATEGORIES[i % len(CATEGORIES)] for i in range(n)], dtype=object)
+    queries = make_vectors(rng, n_queries)
+    query_categories = [CATEGORIES[i % len(CATEGORIES)] for i in range(n_queries)]
+    truth = [exact_top_k(vectors, categories, q, c, k) for q, c in zip(queries, query_categories)]
+
+    tmp = tempfile.mkdtemp()
+    client = chromadb.PersistentClient(path=f"{tmp}/chroma")
+    stores = {
+        "chroma": ChromaStore(lambda: client),
+        "local": LocalStore(f"{tmp}/local"),
+    }
+    print(f"{n} vectors, {n_queries} queries, top-{k} within category")
+    for name, store in stores.items():
+        t0 = time.perf_counter()
+        for start in range(0, n, 1000):
+            rows = range(start, min(start + 1000, n))
+            store.upsert("bench", [vector_id(i, 0) for i in rows], vectors[start:start + 1000].tolist(),
+                         [{"category": categories[i], "item_id": i} for i in rows])
+        build = time.perf_counter() - t0
+
+        latencies, recall = [], []
+        for query, category, expected in zip(queries, query_categories, truth):
+            t0 = time.perf_counter()
+            hits = store.query("bench", [query.tolist()], k, where={"category": category})[0]
+            latencies.append(time.perf_counter() - t0)
+            recall.append(len({int(vid.split(':')[0]) for vid, _, _ in hits} & expected) / len(expected))
+        latencies = np.array(latencies) * 1000
+        print(f"  {name:<7} build {build:6.2f}s   query p50 {np.percentile(latencies, 50):6.2f} ms"
+              f"  p95 {np.percentile(latencies, 95):6.2f} ms   recall@{k} {np.mean(recall):.4f}")
+
+if __name__ == "__main__":
+    # Usage: python bench_vector_store.py [n_vectors] [n_queries]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    bench(n, n_queries)
@@ -0,0 +1,24 @@
+from app import app
+from models import db, LostItem, Match
+import matching
+import notification_cache
+
+def build_matches():
+    """Backfills the match table for items reported before matches were persisted."""
+    with app.app_context():
+        db.create_all()
+        lost_items = LostItem.query.all()
+        print(f"Scoring {len(lost_items)} lost items...")
+        for lost in lost_items:
+            try:
+                matches = matching.match_lost_item(lost)
+                print(f"Lost item {lost.id}: {len(matches)} match(es)")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error matching lost item {lost.id}: {e}")
+        # Only reaches a running server with the sqlite cache backend; the memory one expires on its TTL
+        notification_cache.invalidate_users({lost.user_id for lost in lost_items})
+        print(f"Done. Match table has {Match.query.count()} rows.")
+
+if __name__ == "__main__":
+    build_matches()
@@ -0,0 +1,14 @@
+from app import app
+from models import db
+import text_index
+
+def build_text_index():
+    """Fills the text index posting lists for items reported before the index existed (or rebuilds them)."""
+    with app.app_context():
+        db.create_all()
+        for side in ('lost', 'found'):
+            items, postings = text_index.rebuild(side)
+            print(f"{side}: {items} item(s), {postings} posting(s)")
+
+if __name__ == "__main__":
+    build_text_index()
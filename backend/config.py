@@ -4,4 +4,113 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-prod'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///lostfound.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Applied on every new SQLite connection (see sqlite_tuning.py)
+    SQLITE_PRAGMAS = {
+        "busy_timeout": 5000 # ms to wait for a lock instead of failing with "database is locked"
+    }
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-forced-logout-v2'
+
+    # Uploaded item photos, stored by SHA-256 (see image_store.py)
+    IMAGE_STORE_PATH = os.environ.get('IMAGE_STORE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads', 'images')
+
+    # Background embedding jobs (see jobs.py)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = 1.0 # seconds between queue scans when idle
+    JOB_MAX_ATTEMPTS = 5
+    JOB_BACKOFF_SECONDS = 2 # retry delay doubles per attempt: 2, 4, 8, ...
+    JOB_STALE_SECONDS = 600 # running jobs older than this are assumed dead and requeued
+
+    # CLIP encoding (see vector_utils.py and embedding_backends.py)
+    EMBED_MODEL = 'clip-ViT-B-32' # good balance of speed/performance
+    EMBED_BACKEND = os.environ.get('EMBED_BACKEND', 'sentence-transformers') # or torch-int8, onnx, onnx-int8
+    EMBED_THREADS = int(os.environ.get('EMBED_THREADS', 0)) # intra-op threads per process, 0 = library default
+    EMBED_ONNX_DIR = os.environ.get('EMBED_ONNX_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+    EMBED_IMAGE_SIZE = 224 # uploads are decoded and shrunk to this shortest side before encoding (CLIP's input size)
+    EMBED_IMAGE_MAX_SIDE = 1024 # ...and at most this longest side, for panoramas
+    EMBED_BATCH_SIZE = 32 # get_embeddings() batch size
+    # Embeddings by image content hash and model (see embedding_cache.py), shared by all workers
+    EMBED_CACHE_ENABLED = os.environ.get('EMBED_CACHE', '1').lower() in ('1', 'true', 'yes')
+    EMBED_CACHE_PATH = os.environ.get('EMBED_CACHE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'embedding_cache.db')
+    EMBED_CACHE_SIZE = 10000 # vectors kept in the in-process LRU (~2 KB each)
+    EMBED_MICROBATCH_ENABLED = True # coalesce the encodes of concurrent embedding jobs
+    EMBED_MICROBATCH_SIZE = 16 # max images per coalesced encode
+    EMBED_MICROBATCH_WAIT_MS = 5 # how long the first request waits for company
+
+    # Where image vectors are indexed (see vector_store.py): 'chroma' (ChromaDB PersistentClient in chroma_db/)
+    # or 'local' (exact search over memory-mapped NumPy files). migrate_vectors.py copies between them.
+    VECTOR_STORE = os.environ.get('VECTOR_STORE', 'chroma')
+    VECTOR_STORE_PATH = os.environ.get('VECTOR_STORE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vector_index')
+    # Shard lost_items/found_items into one collection per category ('category') or per category and month
+    # ('category_month') so searches never post-filter a global index. Run partition_vectors.py after changing it.
+    VECTOR_PARTITION = os.environ.get('VECTOR_PARTITION') or None
+    # Load CLIP and open the vector collections when the app starts instead of on the first upload
+    VECTOR_WARMUP = os.environ.get('VECTOR_WARMUP', '').lower() in ('1', 'true', 'yes')
+    # Under gunicorn (gunicorn.conf.py): load CLIP in the master before forking so workers share it
+    VECTOR_PRELOAD = os.environ.get('VECTOR_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+    # reindex.py progress, so an interrupted rebuild resumes after the last finished chunk
+    REINDEX_CHECKPOINT_PATH = os.environ.get('REINDEX_CHECKPOINT_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'reindex_checkpoint.json')
+
+    # Multi-image matching: score an item pair by its best image pair ('max') or the average ('mean')
+    MATCH_IMAGE_AGG = 'max'
+    # Match ranking (see ranker.py): score = sum of weight * feature, features being
+    #   color, location, description  text rule points (0-2, 0-3, 0-2)
+    #   vector, text_vector, cross_modal  cosine similarity of the signal, 0 below its threshold
+    #   date_gap  days between date lost and date found
+    # A typical photo match adds about 5, a description or cross-modal match about 3, every 50 days costs 1.
+    MATCH_WEIGHTS = {
+        "color": 1.0, "location": 1.0, "description": 1.0,
+        "vector": 6.0, "text_vector": 3.5, "cross_modal": 10.0,
+        "date_gap": -0.02
+    }
+    # Matches kept per lost item, best first; 0 keeps every pair that clears a threshold
+    MATCH_TOP_K = int(os.environ.get('MATCH_TOP_K', 20))
+    MATCH_FEATURE_CACHE_SIZE = 50000 # tokenized items kept per side for text scoring (match_engine)
+
+    # GET /api/items/notifications cache (see notification_cache.py)
+    # 'memory' is per process (development server); 'sqlite' shares entries and invalidations between processes,
+    # and is what gunicorn.conf.py and run_jobs.py use unless told otherwise
+    NOTIFICATION_CACHE_BACKEND = os.environ.get('NOTIFICATION_CACHE_BACKEND', 'memory')
+    NOTIFICATION_CACHE_PATH = os.environ.get('NOTIFICATION_CACHE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'notification_cache.db')
+    NOTIFICATION_CACHE_TTL = 300 # seconds; also bounds staleness across workers with the memory backend
+    NOTIFICATION_CACHE_SIZE = 4096 # entries
+
+    # GET /api/items/notifications/stream (see notification_stream.py). Off by default: every open stream holds a
+    # thread of a threaded server, so enable it with gevent workers (gunicorn.conf.py); clients poll otherwise
+    NOTIFICATION_STREAM = os.environ.get('NOTIFICATION_STREAM', '').lower() in ('1', 'true', 'yes')
+    NOTIFICATION_STREAM_POLL_INTERVAL = 2 # seconds between reads of new matches, per web process
+    NOTIFICATION_STREAM_QUEUE_SIZE = 100 # pending events per connection before the client is told to resync
+    NOTIFICATION_STREAM_HEARTBEAT = 15 # seconds between keep-alive comments
+
+class ProductionConfig(Config):
+    """Storage profile for multi-threaded gunicorn workers sharing one SQLite file."""
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL", # readers no longer block on the writer
+        "synchronous": "NORMAL", # safe with WAL, fsync only at checkpoints
+        "busy_timeout": 10000,
+        "mmap_size": 268435456, # 256 MB
+        "cache_size": -64000, # negative = KiB, so 64 MB per connection
+        "temp_store": "MEMORY"
+    }
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+        "connect_args": {
+            "timeout": 10, # sqlite3 module's own lock wait, in seconds
+            "check_same_thread": False
+        }
+    }
+
+class TestingConfig(Config):
+    """In-memory database with per-request query counting (see query_counter.py)."""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    QUERY_COUNTER = True
+    JOB_WORKERS = 0 # Tests call jobs.process() directly
+
+config_by_name = {
+    "development": Config,
+    "production": ProductionConfig,
+    "testing": TestingConfig
+}
@@ -0,0 +1,170 @@
+from PIL import Image
+from config import Config
+import importlib.util
+import os
+import re
+import numpy as np
+
+# Image encoders selectable with EMBED_BACKEND (text always goes through sentence-transformers, see load_text). Each returns an object with a
+# SentenceTransformer-compatible encode(image or [images], batch_size=...), so vector_utils
+# doesn't care which one it got:
+#   sentence-transformers  full-precision PyTorch CLIP (default)
+#   torch-int8             same model with the vision tower's Linear layers dynamically quantized to int8
+#   onnx                   vision tower exported to ONNX, run with ONNX Runtime
+#   onnx-int8              the ONNX export with int8 weights
+BACKENDS = ('sentence-transformers', 'torch-int8', 'onnx', 'onnx-int8')
+
+# CLIP preprocessing (openai/clip-vit-base-patch32): shortest side to 224 bicubic, center crop, normalize
+IMAGE_SIZE = 224
+MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)
+STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+def clip_pixels(img):
+    """One PIL image -> (3, 224, 224) float32 array, the same input the Hugging Face CLIP processor produces."""
+    img = img.convert('RGB')
+    width, height = img.size
+    short = min(width, height)
+    size = (int(IMAGE_SIZE * width / short), int(IMAGE_SIZE * height / short))
+    img = img.resize((max(size[0], IMAGE_SIZE), max(size[1], IMAGE_SIZE)), Image.BICUBIC)
+    left = (img.width - IMAGE_SIZE) // 2
+    top = (img.height - IMAGE_SIZE) // 2
+    img = img.crop((left, top, left + IMAGE_SIZE, top + IMAGE_SIZE))
+    pixels = (np.asarray(img, dtype=np.float32) / 255.0 - MEAN) / STD
+    return pixels.transpose(2, 0, 1)
+
+def _set_torch_threads():
+    if Config.EMBED_THREADS:
+        import torch
+        torch.set_num_threads(Config.EMBED_THREADS)
+
+def _sentence_transformer():
+    from sentence_transformers import SentenceTransformer
+    _set_torch_threads()
+    return SentenceTransformer(Config.EMBED_MODEL)
+
+def _clip(model):
+    """The transformers CLIPModel inside a sentence-transformers CLIP model."""
+    for module in model.modules():
+        if hasattr(module, 'vision_model') and hasattr(module, 'visual_projection'):
+            return module
+    raise ValueError(f"{Config.EMBED_MODEL} has no CLIP vision tower")
+
+def _quantized_sentence_transformer():
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+    model = _sentence_transformer()
+    clip = _clip(model)
+    # Only the image side's Linear layers: weights stored as int8, activations quantized on the fly per batch.
+    # Embeddings and LayerNorms stay float32.
+    quantize_dynamic(clip.vision_model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    clip.visual_projection = quantize_dynamic(torch.nn.Sequential(clip.visual_projection), {torch.nn.Linear}, dtype=torch.qint8)[0]
+    return model
+
+def onnx_path(quantized=False):
+    name = re.sub(r'[^a-z0-9]+', '-', Config.EMBED_MODEL.lower()).strip('-')
+    return os.path.join(Config.EMBED_ONNX_DIR, f"{name}-vision{'-int8' if quantized else ''}.onnx")
+
+def export_onnx(quantized=False):
+    """
+    Exports the vision tower (pixels -> image embedding) to ONNX once, plus an int8 copy if asked.
+    Needs torch, sentence-transformers and the onnx package; serving only needs onnxruntime.
+    Returns the model path.
+    """
+    path = onnx_path()
+    if not os.path.exists(path):
+        import torch
+        print(f"Exporting {Config.EMBED_MODEL} vision tower to {path}...")
+        clip = _clip(_sentence_transformer()).eval()
+
+        class VisionTower(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.vision_model = clip.vision_model
+                self.visual_projection = clip.visual_projection
+
+            def forward(self, pixel_values):
+                return self.visual_projection(self.vision_model(pixel_values=pixel_values).pooler_output)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                VisionTower(), (torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE),), tmp_path,
+                input_names=['pixel_values'], output_names=['image_embeds'],
+                dynamic_axes={'pixel_values': {0: 'batch'}, 'image_embeds': {0: 'batch'}},
+                opset_version=17, dynamo=False
+            )
+        os.replace(tmp_path, path)
+
+    if not quantized:
+        return path
+    int8_path = onnx_path(quantized=True)
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        print(f"Quantizing {path} to int8...")
+        tmp_path = f"{int8_path}.{os.getpid()}.tmp"
+        quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+class OnnxEncoder:
+    """ONNX Runtime session over the exported vision tower."""
+
+    def __init__(self, path):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if Config.EMBED_THREADS:
+            options.intra_op_num_threads = Config.EMBED_THREADS
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def encode(self, images, batch_size=32, **kwargs):
+        single = not isinstance(images, list)
+        images = [images] if single else images
+        outputs = []
+        for start in range(0, len(images), batch_size):
+            pixels = np.stack([clip_pixels(img) for img in images[start:start + batch_size]])
+            outputs.append(self.session.run(None, {'pixel_values': pixels})[0])
+        vectors = np.concatenate(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+def load_text(image_model=None):
+    """
+    Text encoder for item descriptions: CLIP's text tower, so text and image vectors share one space.
+    The sentence-transformers model (also behind torch-int8, which only quantizes the vision side)
+    encodes strings itself; the ONNX backends export only the vision tower and load it separately.
+    """
+    if image_model is not None and not isinstance(image_model, OnnxEncoder):
+        return image_model
+    return _sentence_transformer()
+
+# Module -> pip package, for the startup check
+_PACKAGES = {'sentence_transformers': 'sentence-transformers', 'torch': 'torch', 'onnxruntime': 'onnxruntime', 'onnx': 'onnx'}
+
+def check(name=None):
+    """
+    Raises if EMBED_BACKEND (or name) is unknown or a package it needs isn't installed, without importing anything,
+    so a misconfigured server fails at startup instead of on the first upload.
+    """
+    name = name or Config.EMBED_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EMBED_BACKEND '{name}', expected one of: {', '.join(BACKENDS)}")
+    modules = ['sentence_transformers', 'torch'] # text tower, and export for the ONNX backends
+    if name in ('onnx', 'onnx-int8'):
+        modules.append('onnxruntime')
+        if not os.path.exists(onnx_path(quantized=name == 'onnx-int8')):
+            modules.append('onnx')
+    missing = [_PACKAGES[module] for module in modules if importlib.util.find_spec(module) is None]
+    if missing:
+        raise RuntimeError(f"EMBED_BACKEND '{name}' needs {', '.join(missing)}: pip install {' '.join(missing)}")
+
+def load(name=None):
+    """Loads the image encoder for EMBED_BACKEND (or name)."""
+    name = name or Config.EMBED_BACKEND
+    if name == 'sentence-transformers':
+        return _sentence_transformer()
+    if name == 'torch-int8':
+        return _quantized_sentence_transformer()
+    if name in ('onnx', 'onnx-int8'):
+        return OnnxEncoder(export_onnx(quantized=name == 'onnx-int8'))
+    raise ValueError(f"Unknown EMBED_BACKEND '{name}', expected one of: {', '.join(BACKENDS)}")
@@ -0,0 +1,155 @@
+from config import Config
+from collections import OrderedDict
+import os
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+
+# Embeddings by content: SHA-256 of the uploaded file (the same hash image_store names files by) or of
+# the item text, plus the model id, so re-uploads and re-runs of a job never go through CLIP twice.
+# A SQLite file shared by every worker, with an in-process LRU in front.
+
+def model_id():
+    """Anything that changes the vectors: model, inference backend, input size and the long-side cap of the decode."""
+    return f"{Config.EMBED_MODEL}/{Config.EMBED_BACKEND}/{Config.EMBED_IMAGE_SIZE}/{Config.EMBED_IMAGE_MAX_SIDE}"
+
+def key_for_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def key_for_text(text):
+    # Prefixed so a description can never collide with an image file's hash
+    return hashlib.sha256(f"text:{text}".encode()).hexdigest()
+
+def key_for_image(img):
+    """Key of an image that only exists in memory: hash of its decoded pixels."""
+    digest = hashlib.sha256(f"{img.mode}:{img.width}x{img.height}:".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+class _LRU:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+class _Store:
+    def __init__(self, path, max_size):
+        self.path = path
+        self._local = threading.local()
+        self._front = _LRU(max_size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model, keys):
+        """Returns ({key: vector}, number found in the LRU)."""
+        found = {}
+        for key in keys:
+            vector = self._front.get(f"{model}:{key}")
+            if vector is not None:
+                found[key] = vector
+        memory_hits = len(found)
+        rest = [key for key in keys if key not in found]
+        conn = self._conn()
+        for start in range(0, len(rest), 500): # SQLite variable limit
+            batch = rest[start:start + 500]
+            rows = conn.execute(
+                f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                [model, *batch]
+            )
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                self._front.set(f"{model}:{key}", vector)
+                found[key] = vector
+        return found, memory_hits
+
+    def put_many(self, model, vectors):
+        rows = []
+        for key, vector in vectors.items():
+            vector = np.asarray(vector, dtype=np.float32)
+            self._front.set(f"{model}:{key}", vector)
+            rows.append((model, key, vector.tobytes()))
+        self._conn().executemany("INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)", rows)
+
+_store = None
+_store_lock = threading.Lock()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stored": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+def _get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _Store(Config.EMBED_CACHE_PATH, Config.EMBED_CACHE_SIZE)
+    return _store
+
+def _count(**counts):
+    with _stats_lock:
+        for name, n in counts.items():
+            _stats[name] += n
+
+def get_many(keys):
+    """Cached vectors (float32 arrays) for the given content keys; keys that miss are left out."""
+    keys = list(dict.fromkeys(key for key in keys if key))
+    if not Config.EMBED_CACHE_ENABLED or not keys:
+        return {}
+    try:
+        found, memory_hits = _get_store().get_many(model_id(), keys)
+    except Exception as e:
+        # The cache is an optimization; fall back to encoding
+        print(f"Embedding cache read failed: {e}")
+        _count(errors=1, misses=len(keys))
+        return {}
+    hits = sum(1 for key in keys if key in found)
+    _count(memory_hits=memory_hits, disk_hits=hits - memory_hits, misses=len(keys) - hits)
+    return found
+
+def get(key):
+    return get_many([key]).get(key)
+
+def put_many(vectors):
+    """Stores {key: vector} for the current model."""
+    vectors = {key: vector for key, vector in vectors.items() if key and vector is not None}
+    if not Config.EMBED_CACHE_ENABLED or not vectors:
+        return
+    try:
+        _get_store().put_many(model_id(), vectors)
+        _count(stored=len(vectors))
+    except Exception as e:
+        print(f"Embedding cache write failed: {e}")
+        _count(errors=1)
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+    stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0
+    stats["enabled"] = Config.EMBED_CACHE_ENABLED
+    return stats
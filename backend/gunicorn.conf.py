@@ -0,0 +1,65 @@
+import gc
+import os
+from config import Config
+
+# gunicorn -c gunicorn.conf.py app:app
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:5001')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread') # 'gevent' for notification streams (JOB_WORKERS=0, see run_jobs.py)
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 2000)) # gevent only
+timeout = 120
+
+if worker_class == 'gevent' and Config.JOB_WORKERS:
+    # Under gevent the job workers and the CLIP batcher are greenlets: every encode and numpy call would
+    # block all streams and requests of the worker until it finishes
+    raise RuntimeError("gevent workers need JOB_WORKERS=0; run the embedding jobs in their own process with run_jobs.py")
+
+if Config.NOTIFICATION_STREAM and worker_class != 'gevent':
+    # Each open stream would hold one of the workers * threads request slots for as long as the page is open
+    raise RuntimeError("NOTIFICATION_STREAM needs GUNICORN_WORKER_CLASS=gevent; clients poll /notifications without it")
+
+# Several processes serve /notifications, and run_jobs.py invalidates from outside them: the in-process cache
+# would keep serving stale pages (and per-process ETags) until its TTL, so the shared one is the default here
+if 'NOTIFICATION_CACHE_BACKEND' not in os.environ:
+    Config.NOTIFICATION_CACHE_BACKEND = 'sqlite'
+elif Config.NOTIFICATION_CACHE_BACKEND == 'memory' and (workers > 1 or not Config.JOB_WORKERS):
+    raise RuntimeError("NOTIFICATION_CACHE_BACKEND=memory needs a single worker that runs its own jobs; use sqlite")
+
+# VECTOR_PRELOAD=1: import the app and load CLIP once in the master, then fork. Workers share the
+# model weights copy-on-write instead of each loading its own copy.
+# Use with sync/gthread workers; gevent patches threading after the fork, too late for a preloaded app.
+preload_app = Config.VECTOR_PRELOAD
+
+if preload_app:
+    # Chroma clients, SQLite connections and threads don't survive fork: the master loads only the model,
+    # each worker opens its collections after forking. Job workers already start on the first request.
+    _warm_collections = Config.VECTOR_WARMUP
+    Config.VECTOR_WARMUP = False
+
+def when_ready(server):
+    if preload_app:
+        import vector_utils
+        try:
+            vector_utils.get_model()
+        except Exception as e:
+            # Workers will load it themselves on first use
+            server.log.warning(f"CLIP preload failed: {e}")
+            return
+        # Move everything loaded so far out of the GC's reach, so collections in the workers
+        # don't write to (and un-share) the master's pages
+        gc.freeze()
+        server.log.info("CLIP model preloaded in master.")
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app import app
+    from models import db
+    with app.app_context():
+        # The master's import ran db.create_all(): drop the inherited pool without closing the master's
+        # connections, so this worker opens its own
+        db.engine.dispose(close=False)
+    if _warm_collections:
+        import vector_utils
+        vector_utils.warm_up(model=False)
@@ -0,0 +1,102 @@
+from PIL import Image, ImageOps
+import io
+import time
+import threading
+
+# One decode path for everything that reads uploaded photos (CLIP embeddings, thumbnails).
+# Phone photos are 12+ MP but both consumers want a few hundred pixels, so JPEGs are decoded
+# at 1/2, 1/4 or 1/8 scale straight from the DCT (Image.draft) before anything else touches them.
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+def open_image(source):
+    """Opens raw bytes, a path, a file object or an existing PIL image without decoding pixels yet."""
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return Image.open(source)
+
+def target_size(size, short_side=None, max_side=None):
+    """
+    Size to shrink to so the shortest side is short_side and the longest at most max_side.
+    Never upscales. max_side wins if the two disagree (very long panoramas).
+    """
+    width, height = size
+    scale = 1.0
+    if short_side:
+        scale = min(scale, short_side / min(width, height))
+    if max_side:
+        scale = min(scale, max_side / max(width, height))
+    if scale >= 1.0:
+        return size
+    return (max(1, round(width * scale)), max(1, round(height * scale)))
+
+def _to_rgb(img):
+    if img.mode == 'RGB':
+        return img
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        # Flatten onto white instead of letting transparent areas turn black
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+def prepare(source, short_side=None, max_side=None, purpose='other', draft=True):
+    """
+    Decodes an image into an upright RGB PIL image no larger than needed:
+    reduced JPEG decode, EXIF orientation applied, converted to RGB, shrunk to target_size().
+    Images opened from bytes or paths are closed before returning (multi-frame GIF/TIFF keep their file open otherwise).
+    Records latency and decoded size per purpose, see get_stats().
+    """
+    start = time.perf_counter()
+    if isinstance(source, Image.Image):
+        img, source_pixels, decoded_bytes = _decode(source, short_side, max_side, draft)
+    else:
+        with open_image(source) as opened:
+            img, source_pixels, decoded_bytes = _decode(opened, short_side, max_side, draft)
+            if img is opened:
+                img = img.copy()
+    _record(purpose, time.perf_counter() - start, source_pixels, decoded_bytes)
+    return img
+
+def _decode(img, short_side, max_side, draft):
+    """prepare() without the bookkeeping. Returns (image, source pixels, decoded bytes)."""
+    source_pixels = img.width * img.height
+    size = target_size(img.size, short_side, max_side)
+    if draft and size != img.size:
+        # Asks for at least the final size, so the DCT-scaled image is never smaller than what we resize to.
+        # Rotation (EXIF) doesn't matter: only the shortest/longest side is bounded.
+        img.draft('RGB', (min(size), min(size)) if short_side else size)
+    img.load()
+    decoded_bytes = img.width * img.height * len(img.getbands())
+
+    img = _to_rgb(ImageOps.exif_transpose(img))
+    size = target_size(img.size, short_side, max_side)
+    if size != img.size:
+        img = img.resize(size, Image.BICUBIC, reducing_gap=3.0)
+    return img, source_pixels, decoded_bytes
+
+def _record(purpose, seconds, source_pixels, decoded_bytes):
+    with _stats_lock:
+        stats = _stats.setdefault(purpose, {"images": 0, "seconds": 0.0, "source_pixels": 0, "decoded_bytes": 0})
+        stats["images"] += 1
+        stats["seconds"] += seconds
+        stats["source_pixels"] += source_pixels
+        stats["decoded_bytes"] += decoded_bytes
+
+def get_stats():
+    """Per purpose: images decoded, average latency, source megapixels and decoded buffer size per image."""
+    with _stats_lock:
+        snapshot = {purpose: dict(stats) for purpose, stats in _stats.items()}
+    return {
+        purpose: {
+            "images": s["images"],
+            "avg_ms": round(s["seconds"] / s["images"] * 1000, 2),
+            "avg_source_megapixels": round(s["source_pixels"] / s["images"] / 1e6, 2),
+            "avg_decoded_kb": round(s["decoded_bytes"] / s["images"] / 1024, 1)
+        }
+        for purpose, s in snapshot.items()
+    }
@@ -0,0 +1,104 @@
+from config import Config
+from PIL import Image
+import image_preprocess
+import io
+import os
+import re
+import base64
+import hashlib
+import tempfile
+
+# Content-addressed storage: <root>/<first 2 hex chars>/<sha256>, thumbnails alongside as <sha256>_thumb.jpg
+THUMB_SIZE = (256, 256)
+_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Magic bytes -> mimetype, so we don't have to store or guess an extension
+_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+def is_hash(value):
+    return isinstance(value, str) and bool(_HASH_RE.match(value))
+
+def image_path(image_hash, size=None):
+    folder = os.path.join(Config.IMAGE_STORE_PATH, image_hash[:2])
+    if size == 'thumb':
+        return os.path.join(folder, f"{image_hash}_thumb.jpg")
+    return os.path.join(folder, image_hash)
+
+def image_url(image_hash, size=None):
+    url = f"/api/items/images/{image_hash}"
+    return f"{url}?size={size}" if size else url
+
+def decode_data_url(image_data):
+    """Returns the raw bytes of a base64 image string, with or without the 'data:image...' header."""
+    if ',' in image_data and (image_data.startswith('data:') or ';base64,' in image_data):
+        image_data = image_data.split(',', 1)[1]
+    return base64.b64decode(image_data, validate=True)
+
+def _write_atomic(path, write):
+    """
+    Writes through write(file object) to a temp file next to path, then renames it over path,
+    so a concurrent reader never sees a partial file. The temp name is unique per call:
+    two threads storing the same image (or thumbnail) at once each rename their own complete copy.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.chmod(tmp_path, 0o644) # mkstemp creates 0600; keep files readable like a plain open() would
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def save_bytes(img_bytes):
+    """Stores image bytes under their SHA-256. Identical uploads share one file. Returns the hash."""
+    image_hash = hashlib.sha256(img_bytes).hexdigest()
+    path = image_path(image_hash)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, lambda f: f.write(img_bytes))
+    return image_hash
+
+def verify_image(img_bytes):
+    """Raises ValueError unless PIL recognizes the bytes as an intact image (headers and structure; pixels aren't decoded)."""
+    try:
+        with Image.open(io.BytesIO(img_bytes)) as img:
+            img.verify()
+    except Exception as e:
+        raise ValueError(f"Not a readable image: {e}") from e
+
+def save_images(images):
+    """
+    Stores a list of base64 images (as sent by the report forms). Returns their hashes.
+    Every image is checked before any is written; raises ValueError if one isn't an image.
+    """
+    blobs = [decode_data_url(image_data) for image_data in images]
+    for img_bytes in blobs:
+        verify_image(img_bytes)
+    return [save_bytes(img_bytes) for img_bytes in blobs]
+
+def ensure_thumbnail(image_hash):
+    """Generates the thumbnail for a stored image if it doesn't exist yet. Returns its path."""
+    thumb_path = image_path(image_hash, 'thumb')
+    if not os.path.exists(thumb_path):
+        img = image_preprocess.prepare(image_path(image_hash), max_side=max(THUMB_SIZE), purpose='thumbnail')
+        _write_atomic(thumb_path, lambda f: img.save(f, format='JPEG', quality=85))
+    return thumb_path
+
+def sniff_mimetype(path):
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    for signature, mimetype in _SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
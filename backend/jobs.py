@@ -0,0 +1,221 @@
+from models import db, LostItem, FoundItem, EmbeddingJob
+from datetime import datetime, timedelta
+import vector_utils
+import matching
+import image_store
+import notification_cache
+import threading
+
+# Item type -> (model, vector collection, matcher)
+ITEM_TYPES = {
+    'lost': (LostItem, "lost_items", matching.match_lost_item),
+    'found': (FoundItem, "found_items", matching.match_found_item),
+}
+# Item type -> collection of its text embedding (see item_text)
+TEXT_COLLECTIONS = {'lost': "lost_text", 'found': "found_text"}
+MAX_TEXT_WORDS = 60 # CLIP reads at most 77 tokens
+
+def item_date(item):
+    return item.date_lost if isinstance(item, LostItem) else item.date_found
+
+def item_text(item):
+    """What an item's text embedding describes: name, brand, color and description, whichever it has."""
+    parts = [getattr(item, 'name', None), getattr(item, 'brand', None), item.color, item.description]
+    text = ". ".join(part.strip() for part in parts if part and part.strip())
+    return " ".join(text.split()[:MAX_TEXT_WORDS])
+
+def vector_metadata(item):
+    """Metadata stored with each of the item's image vectors; category and month also pick the partition."""
+    return {
+        "category": item.category,
+        "color": item.color or "",
+        "user_id": item.user_id,
+        "month": vector_utils.month_key(item_date(item)) or ""
+    }
+
+class PermanentJobError(RuntimeError):
+    """A failure that would repeat on every retry (e.g. an image file that can't be decoded); the job fails at once."""
+
+_app = None
+_threads = []
+_started = False
+_start_lock = threading.Lock()
+_wakeup = threading.Event()
+
+def init_app(app):
+    """
+    Registers the job pool with the app. Workers start on the first request,
+    so scripts that only import app (promote_admin.py, debug_db.py, ...) never spawn threads.
+    """
+    global _app
+    _app = app
+
+    @app.before_request
+    def _ensure_workers():
+        start_workers()
+
+def enqueue(item_type, item_id):
+    """Adds an embed-and-index job for an item. Caller commits."""
+    job = EmbeddingJob(item_type=item_type, item_id=item_id, status='pending', attempts=0, run_after=datetime.utcnow())
+    db.session.add(job)
+    return job
+
+def notify():
+    """Wakes an idle worker after a commit instead of waiting for the next poll."""
+    _wakeup.set()
+
+def start_workers():
+    global _started
+    if _started or _app is None:
+        return
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+        if not _app.config.get('JOB_WORKERS', 2):
+            return
+        with _app.app_context():
+            _requeue_stale()
+        for i in range(_app.config.get('JOB_WORKERS', 2)):
+            t = threading.Thread(target=_worker_loop, name=f"embedding-worker-{i}", daemon=True)
+            t.start()
+            _threads.append(t)
+        print(f"Started {len(_threads)} embedding worker(s).")
+
+def run_workers():
+    """Runs the pool in the foreground until interrupted (run_jobs.py)."""
+    start_workers()
+    for t in _threads:
+        t.join()
+
+def _requeue_stale():
+    cutoff = datetime.utcnow() - timedelta(seconds=_app.config.get('JOB_STALE_SECONDS', 600))
+    stale = EmbeddingJob.query.filter(
+        EmbeddingJob.status == 'running',
+        EmbeddingJob.locked_at < cutoff
+    ).update({"status": "pending", "locked_at": None}, synchronize_session=False)
+    db.session.commit()
+    if stale:
+        print(f"Requeued {stale} stale embedding job(s).")
+
+def _claim_next():
+    """Atomically moves the oldest due job to 'running'. Returns it, or None if the queue is empty."""
+    now = datetime.utcnow()
+    candidate = EmbeddingJob.query.filter(
+        EmbeddingJob.status == 'pending',
+        EmbeddingJob.run_after <= now
+    ).order_by(EmbeddingJob.id).first()
+    if candidate is None:
+        return None
+
+    # Another worker (or process) may have taken it between the select and the update
+    claimed = EmbeddingJob.query.filter(
+        EmbeddingJob.id == candidate.id,
+        EmbeddingJob.status == 'pending'
+    ).update({
+        "status": "running",
+        "locked_at": now,
+        "attempts": EmbeddingJob.attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return None
+    return db.session.get(EmbeddingJob, candidate.id)
+
+def _worker_loop():
+    poll_interval = _app.config.get('JOB_POLL_INTERVAL', 1.0)
+    while True:
+        try:
+            with _app.app_context():
+                job = _claim_next()
+                if job is not None:
+                    _run(job)
+                    continue
+        except Exception as e:
+            print(f"Embedding worker error: {e}")
+        _wakeup.wait(poll_interval)
+        _wakeup.clear()
+
+def _run(job):
+    try:
+        process(job.item_type, job.item_id)
+        job.status = 'done'
+        job.last_error = None
+        job.locked_at = None
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(EmbeddingJob, job.id)
+        job.last_error = str(e)
+        job.locked_at = None
+        if isinstance(e, PermanentJobError) or job.attempts >= _app.config.get('JOB_MAX_ATTEMPTS', 5):
+            job.status = 'failed'
+            print(f"Embedding job {job.id} failed permanently: {e}")
+        else:
+            delay = _app.config.get('JOB_BACKOFF_SECONDS', 2) * (2 ** (job.attempts - 1))
+            job.status = 'pending'
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            print(f"Embedding job {job.id} failed (attempt {job.attempts}), retrying in {delay}s: {e}")
+        db.session.commit()
+
+def process(item_type, item_id):
+    """
+    Embeds and indexes every image and the text of the item and persists its matches.
+    Raises on failure so the job retries, PermanentJobError if only undecodable images failed.
+    """
+    model, collection_name, match_item = ITEM_TYPES[item_type]
+    item = db.session.get(model, item_id)
+    if item is None:
+        # Deleted before the job ran, nothing to do
+        return
+
+    embeddings = []
+    error = None
+    permanent = False
+    images_list = item.images or []
+    if images_list:
+        print(f"Vectorizing {len(images_list)} image(s) of {item_type} item {item.id}...")
+        for image_hash in images_list:
+            try:
+                image_store.ensure_thumbnail(image_hash)
+            except Exception as e:
+                print(f"Error generating thumbnail for {image_hash}: {e}")
+        embeddings = vector_utils.get_embeddings([image_store.image_path(h) for h in images_list])
+        failed = [h for h, e in zip(images_list, embeddings) if e is None]
+        if failed:
+            error = f"Could not generate embedding for {len(failed)} of {len(images_list)} image(s)"
+            # Files that can't be decoded fail the same way on every retry; anything else (the model) may recover
+            permanent = all(vector_utils.load_image(image_store.image_path(h)) is None for h in failed)
+        written = vector_utils.add_item_vectors(
+            collection_name=collection_name,
+            item_id=item.id,
+            embeddings=embeddings,
+            metadata=vector_metadata(item)
+        )
+        if written is None:
+            error = f"Could not add vectors to {collection_name}"
+            permanent = False
+
+    # Descriptions get their own vector, so items without photos still have an embedding to search with
+    text_embedding = None
+    text = item_text(item)
+    if text:
+        text_embedding = vector_utils.get_text_embeddings([text])[0]
+        if text_embedding is None:
+            error = error or "Could not generate the text embedding"
+            permanent = False
+        elif vector_utils.add_item_vectors(TEXT_COLLECTIONS[item_type], item.id, [text_embedding], vector_metadata(item)) is None:
+            error = error or f"Could not add vectors to {TEXT_COLLECTIONS[item_type]}"
+            permanent = False
+
+    # Text matches are stored even if the image step failed; the retry adds the visual ones
+    query_embeddings = [e for e in embeddings if e is not None]
+    # Open notification streams pick the new rows up from the table (notification_stream's poller)
+    match_item(item, query_embeddings=query_embeddings, text_embedding=text_embedding)
+    if item_type == 'lost':
+        notification_cache.invalidate_users([item.user_id])
+    else:
+        notification_cache.invalidate_category(item.category)
+
+    if error:
+        raise (PermanentJobError if permanent else RuntimeError)(error)
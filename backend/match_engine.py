@@ -0,0 +1,180 @@
+from text_index import STOPWORDS
+from config import Config
+from collections import OrderedDict
+import numpy as np
+import threading
+import text_index
+
+# Token -> integer id, shared by every corpus. Keys are (field, token) so color and description tokens don't collide.
+_vocab = {}
+_vocab_lock = threading.Lock()
+
+def _token_ids(field, tokens):
+    ids = []
+    for token in tokens:
+        key = (field, token)
+        token_id = _vocab.get(key)
+        if token_id is None:
+            with _vocab_lock:
+                token_id = _vocab.setdefault(key, len(_vocab))
+        ids.append(token_id)
+    return np.unique(np.array(ids, dtype=np.int64))
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+class Features:
+    """
+    One item's fields, normalized once the way matching.text_score() reads them.
+    Empty strings stand for missing fields (text_score skips a rule when either side is falsy).
+    """
+    __slots__ = ('color', 'color_tokens', 'location', 'desc_tokens', 'day')
+
+    def __init__(self, color, location, description, day=None):
+        self.color = color.lower() if color else ''
+        self.color_tokens = _token_ids('c', {c.strip().lower() for c in color.split(',')}) if color else _EMPTY
+        self.location = location.lower() if location else ''
+        words = set(description.lower().split()) - STOPWORDS if description else ()
+        self.desc_tokens = _token_ids('d', words) if words else _EMPTY
+        self.day = day.toordinal() if day else 0
+
+def _csr(token_arrays):
+    """Flattens per-item token id arrays into (row index per entry, token ids)."""
+    lengths = np.fromiter((len(t) for t in token_arrays), dtype=np.int64, count=len(token_arrays))
+    rows = np.repeat(np.arange(len(token_arrays)), lengths)
+    indices = np.concatenate(token_arrays) if token_arrays else _EMPTY
+    return rows, indices
+
+class Corpus:
+    """
+    Column arrays over a set of items so one query item can be scored against all of them
+    in a few NumPy operations instead of a Python loop per pair.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self._features = []
+        self._arrays = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, item_id, features):
+        with self._lock:
+            self.ids.append(item_id)
+            self._features.append(features)
+            self._arrays = None
+
+    def _build(self):
+        f = self._features
+        color = np.array([x.color for x in f], dtype=str)
+        location = np.array([x.location for x in f], dtype=str)
+        color_rows, color_indices = _csr([x.color_tokens for x in f])
+        desc_rows, desc_indices = _csr([x.desc_tokens for x in f])
+        self._arrays = {
+            "ids": np.array(self.ids, dtype=np.int64),
+            "day": np.array([x.day for x in f], dtype=np.int64),
+            "color": color,
+            "has_color": np.char.str_len(color) > 0,
+            "color_rows": color_rows,
+            "color_indices": color_indices,
+            "location": location,
+            "has_location": np.char.str_len(location) > 0,
+            "desc_rows": desc_rows,
+            "desc_indices": desc_indices,
+        }
+        return self._arrays
+
+    def arrays(self):
+        with self._lock:
+            return self._arrays if self._arrays is not None else self._build()
+
+    def features(self, query, min_day=None, max_day=None):
+        """
+        Per-rule points of query (Features) against every item, with the same rules as matching.text_score():
+        color token overlap +2 else substring +1, location equal +3 else substring +1,
+        description overlap (stopwords removed) of 2+ words +2, 1 word +1.
+        min_day/max_day: optional date window (ordinals) on the items' dates.
+        Returns (ids, {"color", "location", "description": array}).
+        """
+        a = self.arrays()
+        n = len(a["ids"])
+        zeros = np.zeros(n, dtype=np.int64)
+        features = {"color": zeros, "location": zeros, "description": zeros}
+
+        if n and query.color:
+            overlap = np.zeros(n, dtype=bool)
+            overlap[a["color_rows"][np.isin(a["color_indices"], query.color_tokens)]] = True
+            substring = (np.char.find(a["color"], query.color) >= 0) | (np.char.find(query.color, a["color"]) >= 0)
+            has = a["has_color"]
+            features["color"] = np.where(has & overlap, 2, np.where(has & substring, 1, 0))
+
+        if n and query.location:
+            equal = a["location"] == query.location
+            substring = (np.char.find(a["location"], query.location) >= 0) | (np.char.find(query.location, a["location"]) >= 0)
+            has = a["has_location"]
+            features["location"] = np.where(has & equal, 3, np.where(has & substring, 1, 0))
+
+        if n and len(query.desc_tokens):
+            hits = a["desc_rows"][np.isin(a["desc_indices"], query.desc_tokens)]
+            overlap = np.bincount(hits, minlength=n)
+            features["description"] = np.where(overlap >= 2, 2, np.where(overlap >= 1, 1, 0))
+
+        in_window = np.ones(n, dtype=bool)
+        if min_day is not None:
+            in_window &= a["day"] >= min_day
+        if max_day is not None:
+            in_window &= a["day"] <= max_day
+        return a["ids"][in_window], {name: values[in_window] for name, values in features.items()}
+
+    def score(self, query, min_day=None, max_day=None):
+        """Text score (color + location + description points, see features()) against every item. Returns (ids, scores) arrays."""
+        ids, features = self.features(query, min_day, max_day)
+        return ids, features["color"] + features["location"] + features["description"]
+
+# Tokenized fields of recently scored items per side, least recently used first. Items are never edited after they are reported.
+_cache = {'lost': OrderedDict(), 'found': OrderedDict()}
+_cache_lock = threading.Lock()
+
+def _features(side, category, query, words, min_day=None, max_day=None):
+    """Scores query against the side's items that share an index token with it (text_index); the rest score 0."""
+    ids = text_index.candidates(side, category, words, min_day, max_day)
+    cache = _cache[side]
+    features = {}
+    with _cache_lock:
+        for item_id in ids:
+            cached = cache.get(item_id)
+            if cached is not None:
+                cache.move_to_end(item_id)
+                features[item_id] = cached
+    missing = [item_id for item_id in ids if item_id not in features]
+    loaded = {item_id: Features(color, location, description, day)
+              for item_id, color, location, description, day in text_index.rows(side, missing)}
+    features.update(loaded)
+    with _cache_lock:
+        cache.update(loaded)
+        while len(cache) > Config.MATCH_FEATURE_CACHE_SIZE:
+            cache.popitem(last=False)
+    corpus = Corpus()
+    for item_id in ids:
+        if item_id in features: # deleted since the index lookup
+            corpus.add(item_id, features[item_id])
+    return corpus.features(query)
+
+def clear():
+    """Drops the cached fields, for callers that recreate the tables."""
+    with _cache_lock:
+        for cache in _cache.values():
+            cache.clear()
+
+def features_lost(lost):
+    """Per-rule text features of a lost item against the found items of its category found on or after date_lost, see Corpus.features()."""
+    query = Features(lost.color, lost.location, lost.description, lost.date_lost)
+    words = text_index.query_tokens(lost.color, lost.location, lost.description)
+    return _features('found', lost.category, query, words, min_day=lost.date_lost)
+
+def features_found(found):
+    """Per-rule text features of a found item against the lost items of its category lost on or before date_found, see Corpus.features()."""
+    query = Features(found.color, found.location_found, found.description, found.date_found)
+    words = text_index.query_tokens(found.color, found.location_found, found.description)
+    return _features('lost', found.category, query, words, max_day=found.date_found)
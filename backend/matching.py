@@ -0,0 +1,218 @@
+from models import db, LostItem, FoundItem, Match
+from config import Config
+from sqlalchemy.exc import IntegrityError
+from match_engine import STOPWORDS
+import match_engine
+import ranker
+import vector_utils
+
+TEXT_THRESHOLD = 2
+VECTOR_THRESHOLD = 0.5
+VECTOR_RESULTS = 5
+# CLIP text embeddings: description vs description, and lost description vs found photos.
+# Text-image cosines run far lower than image-image or text-text ones, hence the separate thresholds.
+TEXT_VECTOR_THRESHOLD = 0.85
+CROSS_MODAL_THRESHOLD = 0.26
+TEXT_VECTOR_RESULTS = 10
+
+def text_score(lost, found):
+    """
+    Scores a lost/found pair on color, location and description overlap.
+    Reference version of the rules; match_engine scores whole candidate sets with the same results.
+    """
+    match_score = 0
+
+    # 1. Color matching (Partial/Fuzzy)
+    if found.color and lost.color:
+        lost_colors = [c.strip().lower() for c in lost.color.split(',')]
+        found_colors = [c.strip().lower() for c in found.color.split(',')]
+        # Check for any overlap
+        if any(c in found_colors for c in lost_colors) or any(c in lost_colors for c in found_colors):
+            match_score += 2
+        elif lost.color.lower() in found.color.lower() or found.color.lower() in lost.color.lower():
+            match_score += 1
+
+    # 2. Location matching (Keyword overlap)
+    if found.location_found and lost.location:
+        lost_loc = lost.location.lower()
+        found_loc = found.location_found.lower()
+        if lost_loc == found_loc:
+            match_score += 3
+        elif lost_loc in found_loc or found_loc in lost_loc:
+            match_score += 1
+
+    # 3. Description overlap
+    if found.description and lost.description:
+        overlap = set(lost.description.lower().split()) & set(found.description.lower().split())
+        overlap = {w for w in overlap if w not in STOPWORDS}
+        if len(overlap) >= 2:
+            match_score += 2
+        elif len(overlap) >= 1:
+            match_score += 1
+
+    return match_score
+
+def save_match(lost_id, found_id, text_score=0, vector_score=None, existing=None,
+               text_vector_score=None, cross_modal_score=None, rank_score=None):
+    """
+    Inserts or updates the Match row for a pair. Caller commits.
+    existing: optional {(lost_id, found_id): Match} preloaded by the caller, saves a lookup per pair
+    text_vector_score/cross_modal_score: semantic signals from the text embeddings, None below threshold
+    rank_score: the pair's ranker.score()
+    Returns the Match, or None if the pair doesn't clear any threshold.
+    """
+    has_text = text_score >= TEXT_THRESHOLD
+    has_vector = vector_score is not None
+    has_semantic = text_vector_score is not None or cross_modal_score is not None
+    kinds = [kind for kind, has in (("text", has_text), ("visual", has_vector), ("semantic", has_semantic)) if has]
+    if not kinds:
+        return None
+    method = kinds[0] if len(kinds) == 1 else "hybrid"
+
+    if existing is not None:
+        match = existing.get((lost_id, found_id))
+    else:
+        match = Match.query.filter_by(lost_id=lost_id, found_id=found_id).first()
+    if match is None:
+        match = Match(lost_id=lost_id, found_id=found_id)
+        db.session.add(match)
+    match.text_score = text_score if has_text else 0
+    match.vector_score = vector_score
+    match.text_vector_score = text_vector_score
+    match.cross_modal_score = cross_modal_score
+    match.method = method
+    match.rank_score = rank_score
+    return match
+
+def _vector_hits(collection_name, category, query_embeddings, month_from=None, month_to=None,
+                 threshold=VECTOR_THRESHOLD, n_results=VECTOR_RESULTS):
+    """
+    Returns {item_id: similarity} for the nearest items of the category in the other collection, over all query/item vector pairs.
+    month_from/month_to: date window as months, lets month-partitioned indexes skip partitions
+    """
+    if not query_embeddings:
+        return {}
+    return vector_utils.search_items(
+        collection_name=collection_name,
+        query_embeddings=query_embeddings,
+        n_results=n_results,
+        threshold=threshold,
+        where={"category": category},
+        aggregate=Config.MATCH_IMAGE_AGG,
+        month_from=month_from,
+        month_to=month_to
+    )
+
+def _stored_text_embedding(collection_name, item_id, category, day):
+    found = vector_utils.get_item_embeddings(
+        collection_name, [item_id], category=category, month=vector_utils.month_key(day)
+    ).get(item_id)
+    return found[0] if found else None
+
+def _prefilter(candidates, model, date_column, *criteria):
+    """Cuts candidates from every source to the open items of the category/date window, reading only their rows."""
+    ids = candidates.ids()
+    allowed = {}
+    for start in range(0, len(ids), 500): # SQLite variable limit
+        allowed.update(db.session.query(model.id, date_column).filter(model.id.in_(ids[start:start + 500]), *criteria).all())
+    candidates.restrict(allowed)
+
+def _save_ranked(pair, candidates, load_existing, attempts=3):
+    """
+    Persists the best candidates of one new item, at most Config.MATCH_TOP_K per lost item,
+    then drops the lost items' matches that fell out of their top k. pair(other_id) -> (lost_id, found_id).
+    load_existing() -> {(lost_id, found_id): Match} of the item's stored matches.
+    Returns the new or updated matches that were kept.
+    """
+    for attempt in range(attempts):
+        existing = load_existing()
+        k = Config.MATCH_TOP_K
+        saved = {}
+        matches = []
+        for rank_score, other_id, features in candidates.ranked():
+            lost_id, found_id = pair(other_id)
+            if k and saved.get(lost_id, 0) >= k and (lost_id, found_id) not in existing:
+                # Can't make the top k. Stored pairs are still rescored below, so prune() doesn't
+                # rank them on the score of an older match run
+                continue
+            match = save_match(lost_id, found_id, ranker.text_score(features), features["vector"], existing,
+                               features["text_vector"], features["cross_modal"], rank_score)
+            if match:
+                saved[lost_id] = saved.get(lost_id, 0) + 1
+                matches.append(match)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # The other item's job inserted one of these pairs (uq_match_pair) after existing was read:
+            # start over with its row instead of failing the job
+            db.session.rollback()
+            if attempt == attempts - 1:
+                raise
+            continue
+        deleted = ranker.prune(saved.keys())
+        db.session.commit()
+        return [m for m in matches if m.id not in deleted]
+
+def match_lost_item(lost, query_embeddings=None, text_embedding=None):
+    """
+    Ranks the open found items of the lost item's category found on or after date_lost
+    and persists its top matches.
+    query_embeddings: the lost item's image embeddings, looked up in Chroma if omitted.
+    text_embedding: the lost item's text embedding, looked up if omitted. Searched against the found
+    items' texts and photos, so a report without photos still gets vector matches.
+    """
+    candidates = ranker.Candidates(lost.date_lost)
+    candidates.add_text(*match_engine.features_lost(lost))
+
+    # Only the hash list is consulted here, never the image files
+    if query_embeddings is None and lost.images:
+        query_embeddings = vector_utils.get_item_embeddings(
+            "lost_items", [lost.id], category=lost.category, month=vector_utils.month_key(lost.date_lost)
+        ).get(lost.id)
+    month_from = vector_utils.month_key(lost.date_lost)
+    candidates.add("vector", _vector_hits("found_items", lost.category, query_embeddings, month_from=month_from))
+
+    if text_embedding is None:
+        text_embedding = _stored_text_embedding("lost_text", lost.id, lost.category, lost.date_lost)
+    text_queries = [text_embedding] if text_embedding is not None else []
+    candidates.add("text_vector", _vector_hits("found_text", lost.category, text_queries, month_from=month_from,
+                                               threshold=TEXT_VECTOR_THRESHOLD, n_results=TEXT_VECTOR_RESULTS))
+    candidates.add("cross_modal", _vector_hits("found_items", lost.category, text_queries, month_from=month_from,
+                                               threshold=CROSS_MODAL_THRESHOLD, n_results=TEXT_VECTOR_RESULTS))
+
+    _prefilter(candidates, FoundItem, FoundItem.date_found,
+               FoundItem.category == lost.category, FoundItem.date_found >= lost.date_lost, FoundItem.status == 'found')
+    return _save_ranked(lambda found_id: (lost.id, found_id), candidates,
+                        lambda: {(m.lost_id, m.found_id): m for m in Match.query.filter_by(lost_id=lost.id)})
+
+def match_found_item(found, query_embeddings=None, text_embedding=None):
+    """
+    Reverse search at ingest: ranks a new found item against the open lost items it could belong to
+    (same category, lost on or before date_found) and persists the pairs that make those items' top k.
+    One text pass and one batched vector query per signal, so each new pair is scored once.
+    query_embeddings: the found item's image embeddings, looked up in Chroma if omitted.
+    text_embedding: the found item's text embedding, looked up if omitted.
+    The cross-modal signal is the same pair similarity as in match_lost_item, searched from the photo side.
+    """
+    candidates = ranker.Candidates(found.date_found)
+    candidates.add_text(*match_engine.features_found(found))
+
+    if query_embeddings is None and found.images:
+        query_embeddings = vector_utils.get_item_embeddings(
+            "found_items", [found.id], category=found.category, month=vector_utils.month_key(found.date_found)
+        ).get(found.id)
+    month_to = vector_utils.month_key(found.date_found)
+    candidates.add("vector", _vector_hits("lost_items", found.category, query_embeddings, month_to=month_to))
+
+    if text_embedding is None:
+        text_embedding = _stored_text_embedding("found_text", found.id, found.category, found.date_found)
+    text_queries = [text_embedding] if text_embedding is not None else []
+    candidates.add("text_vector", _vector_hits("lost_text", found.category, text_queries, month_to=month_to,
+                                               threshold=TEXT_VECTOR_THRESHOLD, n_results=TEXT_VECTOR_RESULTS))
+    candidates.add("cross_modal", _vector_hits("lost_text", found.category, query_embeddings, month_to=month_to,
+                                               threshold=CROSS_MODAL_THRESHOLD, n_results=TEXT_VECTOR_RESULTS))
+
+    _prefilter(candidates, LostItem, LostItem.date_lost,
+               LostItem.category == found.category, LostItem.date_lost <= found.date_found, LostItem.status == 'lost')
+    return _save_ranked(lambda lost_id: (lost_id, found.id), candidates,
+                        lambda: {(m.lost_id, m.found_id): m for m in Match.query.filter_by(found_id=found.id)})
@@ -23,10 +23,29 @@ def update_schema():
         except Exception as e:
             print(f"CCTVRequest table note: {e}")
 
-        # Create CCTVFootage if it doesn't exist
+        # Semantic match signals (text embeddings)
+        try:
+            db.session.execute(text('ALTER TABLE "match" ADD COLUMN text_vector_score FLOAT'))
+            db.session.execute(text('ALTER TABLE "match" ADD COLUMN cross_modal_score FLOAT'))
+            db.session.commit()
+            print("Successfully added semantic score columns to 'match' table.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Match table note: {e}")
+
+        # Ranked matches (run build_matches.py afterwards to score existing rows)
+        try:
+            db.session.execute(text('ALTER TABLE "match" ADD COLUMN rank_score FLOAT'))
+            db.session.commit()
+            print("Successfully added 'rank_score' column to 'match' table.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Match table note: {e}")
+
+        # Create CCTVFootage and the text index tables if they don't exist
         try:
             db.create_all()
-            print("Ensured all tables (including CCTVFootage) exist.")
+            print("Ensured all tables (including CCTVFootage) exist. Run build_text_index.py to index existing items.")
         except Exception as e:
             print(f"Error ensuring tables: {e}")
 
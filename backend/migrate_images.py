@@ -0,0 +1,40 @@
+from app import app
+from models import db, LostItem, FoundItem
+from sqlalchemy import text
+import image_store
+
+def migrate_images():
+    """
+    Moves base64 images out of the item tables into the image store, leaving only hashes behind.
+    Run migrate_images_json.py first on databases created before the images column became JSON.
+    """
+    with app.app_context():
+        for model in (LostItem, FoundItem):
+            migrated = 0
+            for item in model.query.all():
+                images = item.images or []
+                if all(image_store.is_hash(i) for i in images):
+                    continue
+                try:
+                    hashes = [i if image_store.is_hash(i) else image_store.save_bytes(image_store.decode_data_url(i)) for i in images]
+                    for image_hash in hashes:
+                        image_store.ensure_thumbnail(image_hash)
+                    item.images = hashes
+                    db.session.commit()
+                    migrated += 1
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error migrating images of {model.__tablename__} {item.id}: {e}")
+            print(f"Migrated {migrated} {model.__tablename__} row(s).")
+
+        # Give the space taken by the old base64 strings back to the filesystem
+        try:
+            db.session.commit()
+            with db.engine.connect() as conn:
+                conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+            print("Database vacuumed.")
+        except Exception as e:
+            print(f"VACUUM note: {e}")
+
+if __name__ == "__main__":
+    migrate_images()
@@ -0,0 +1,38 @@
+from app import app
+from models import db
+from sqlalchemy import text
+import json
+import ast
+
+def migrate_images_json():
+    """
+    Converts the images column from the old str(list) format ("['...']") to JSON.
+    Uses raw SQL because the models now expect JSON and can't load the old rows.
+    """
+    with app.app_context():
+        for table in ('lost_item', 'found_item'):
+            converted = 0
+            rows = db.session.execute(text(f"SELECT id, images FROM {table}")).fetchall()
+            for row_id, images in rows:
+                if images is None:
+                    continue
+                try:
+                    json.loads(images)
+                    continue # Already JSON
+                except ValueError:
+                    pass
+                try:
+                    value = ast.literal_eval(images)
+                except (ValueError, SyntaxError):
+                    print(f"{table} {row_id}: unreadable images value, resetting to []")
+                    value = []
+                db.session.execute(
+                    text(f"UPDATE {table} SET images = :images WHERE id = :id"),
+                    {"images": json.dumps(value), "id": row_id}
+                )
+                converted += 1
+            db.session.commit()
+            print(f"Converted {converted} {table} row(s) to JSON.")
+
+if __name__ == "__main__":
+    migrate_images_json()
@@ -0,0 +1,39 @@
+import sys
+import vector_utils
+import vector_store
+from config import Config
+
+COLLECTIONS = ["lost_items", "found_items", "lost_text", "found_text"]
+
+def _physical_collections(store):
+    """
+    The item collections the store actually has: the base names and their partitions
+    (<base>__<category>[__<month>], see vector_utils.partition_name), whatever VECTOR_PARTITION is now.
+    Only existing ones are listed, so exporting never creates an empty collection in the source.
+    """
+    existing = store.list_collections()
+    return sorted(name for name in existing for base in COLLECTIONS if name == base or name.startswith(f"{base}__"))
+
+def migrate_vectors(source='chroma', target='local', batch_size=1000):
+    """
+    Copies every vector (ids, embeddings, metadata) of the item collections, partitions included, from one store to another,
+    e.g. exports the ChromaDB collections into the local index before switching VECTOR_STORE=local.
+    Safe to re-run: writes are upserts keyed by vector id.
+    """
+    stores = {
+        'chroma': lambda: vector_store.ChromaStore(vector_utils.get_client),
+        'local': lambda: vector_store.LocalStore(Config.VECTOR_STORE_PATH),
+    }
+    src, dst = stores[source](), stores[target]()
+    for name in _physical_collections(src):
+        copied = 0
+        for ids, embeddings, metadatas in src.export(name, batch_size=batch_size):
+            dst.upsert(name, ids, embeddings, metadatas)
+            copied += len(ids)
+            print(f"{name}: {copied} vector(s) copied...")
+        print(f"{name}: done, {source} has {src.count(name)}, {target} has {dst.count(name)}.")
+    print(f"Set VECTOR_STORE={target} to serve from the {target} store.")
+
+if __name__ == "__main__":
+    # Usage: python migrate_vectors.py [source] [target]   (chroma -> local by default)
+    migrate_vectors(*sys.argv[1:3])
@@ -1,7 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
+import image_store
 
 db = SQLAlchemy()
 
+def image_urls(images, size=None):
+    # Rows not yet run through migrate_images.py may still hold data URLs, pass those through
+    return [image_store.image_url(h, size) if image_store.is_hash(h) else h for h in images or []]
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), nullable=False)
@@ -34,11 +39,17 @@ class LostItem(db.Model):
     owner_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(20), nullable=False)
-    images = db.Column(db.Text) # Storing as JSON string
+    images = db.Column(db.JSON, default=list) # List of image-store hashes
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     status = db.Column(db.String(20), default='lost')
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
+    __table_args__ = (
+        db.Index('ix_lost_item_user_id', 'user_id'), # notifications, my items
+        db.Index('ix_lost_item_category_date_lost', 'category', 'date_lost'), # found-side matching
+        db.Index('ix_lost_item_created_at_id', 'created_at', 'id'), # newest-first listing
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -55,7 +66,8 @@ class LostItem(db.Model):
             "owner_name": self.owner_name,
             "email": self.email,
             "phone": self.phone,
-            "images": self.images,
+            "images": image_urls(self.images),
+            "thumbnails": image_urls(self.images, 'thumb'),
             "user_id": self.user_id,
             "status": self.status,
             "created_at": self.created_at.isoformat() if self.created_at else None
@@ -72,11 +84,16 @@ class FoundItem(db.Model):
     finder_name = db.Column(db.String(100), nullable=False)
     contact = db.Column(db.String(120), nullable=False)
     consent = db.Column(db.Boolean, default=False)
-    images = db.Column(db.Text) # Storing as JSON string
+    images = db.Column(db.JSON, default=list) # List of image-store hashes
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     status = db.Column(db.String(20), default='found')
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
+    __table_args__ = (
+        db.Index('ix_found_item_category_date_found', 'category', 'date_found'), # lost-side matching
+        db.Index('ix_found_item_created_at_id', 'created_at', 'id'), # newest-first listing
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -89,7 +106,8 @@ class FoundItem(db.Model):
             "finder_name": self.finder_name,
             "contact": self.contact,
             "consent": self.consent,
-            "images": self.images,
+            "images": image_urls(self.images),
+            "thumbnails": image_urls(self.images, 'thumb'),
             "status": self.status,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
@@ -108,6 +126,11 @@ class CCTVRequest(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', backref=db.backref('cctv_requests', lazy=True))
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_cctv_request_user_id_created_at', 'user_id', 'created_at'), # my-requests
+        db.Index('ix_cctv_request_created_at', 'created_at'), # admin listing
+    )
     
     footages = db.relationship('CCTVFootage', backref='request', lazy=True, cascade="all, delete-orphan")
 
@@ -131,7 +154,7 @@ class CCTVRequest(db.Model):
 
 class CCTVFootage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    request_id = db.Column(db.Integer, db.ForeignKey('cctv_request.id'), nullable=False)
+    request_id = db.Column(db.Integer, db.ForeignKey('cctv_request.id'), nullable=False, index=True)
     file_path = db.Column(db.String(500), nullable=False)
     uploaded_at = db.Column(db.DateTime, server_default=db.func.now())
 
@@ -142,3 +165,88 @@ class CCTVFootage(db.Model):
             "file_path": self.file_path,
             "uploaded_at": self.uploaded_at.isoformat() if self.uploaded_at else None
         }
+
+class LostItemToken(db.Model):
+    """Posting list entry of the text index (see text_index.py): a word of a lost item's color, location or description."""
+    category = db.Column(db.String(50), primary_key=True)
+    token = db.Column(db.String(100), primary_key=True)
+    day = db.Column(db.Date, primary_key=True) # date_lost, so a lookup range-scans only the date window
+    item_id = db.Column(db.Integer, db.ForeignKey('lost_item.id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class FoundItemToken(db.Model):
+    """Posting list entry of the text index (see text_index.py): a word of a found item's color, location or description."""
+    category = db.Column(db.String(50), primary_key=True)
+    token = db.Column(db.String(100), primary_key=True)
+    day = db.Column(db.Date, primary_key=True) # date_found, so a lookup range-scans only the date window
+    item_id = db.Column(db.Integer, db.ForeignKey('found_item.id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class Match(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    lost_id = db.Column(db.Integer, db.ForeignKey('lost_item.id'), nullable=False, index=True)
+    found_id = db.Column(db.Integer, db.ForeignKey('found_item.id'), nullable=False, index=True)
+    text_score = db.Column(db.Integer, default=0)
+    vector_score = db.Column(db.Float) # Cosine similarity, None if no visual match
+    text_vector_score = db.Column(db.Float) # Cosine similarity of the two text embeddings, None if below threshold
+    cross_modal_score = db.Column(db.Float) # Lost item's text vs found item's photos, None if below threshold
+    method = db.Column(db.String(20), nullable=False) # text, visual, semantic, hybrid
+    rank_score = db.Column(db.Float) # ranker.score() of the pair's features when it was last matched
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    lost_item = db.relationship('LostItem', backref=db.backref('matches', lazy=True, cascade="all, delete-orphan"))
+    found_item = db.relationship('FoundItem', backref=db.backref('matches', lazy=True, cascade="all, delete-orphan"))
+
+    __table_args__ = (db.UniqueConstraint('lost_id', 'found_id', name='uq_match_pair'),)
+
+    @property
+    def score(self):
+        # Weighted sum of the pair's features (Config.MATCH_WEIGHTS); rows matched before ranking have only the text score
+        return self.rank_score if self.rank_score is not None else (self.text_score or 0)
+
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "type": "match",
+            "match_method": self.method,
+            "lost_item": self.lost_item.to_dict(),
+            "found_item": self.found_item.to_dict(),
+            "score": self.score,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+        if self.vector_score is not None:
+            data["vector_score"] = self.vector_score
+        if self.text_vector_score is not None:
+            data["text_vector_score"] = self.text_vector_score
+        if self.cross_modal_score is not None:
+            data["cross_modal_score"] = self.cross_modal_score
+        return data
+
+class EmbeddingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    item_type = db.Column(db.String(10), nullable=False) # 'lost' or 'found'
+    item_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='pending') # pending, running, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    run_after = db.Column(db.DateTime, server_default=db.func.now()) # Backoff: not picked up before this
+    locked_at = db.Column(db.DateTime) # Set while a worker holds the job
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    __table_args__ = (db.Index('ix_embedding_job_status_run_after', 'status', 'run_after'),)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "item_type": self.item_type,
+            "item_id": self.item_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "run_after": self.run_after.isoformat() if self.run_after else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,181 @@
+from models import db, LostItem
+from config import Config
+from collections import OrderedDict
+import os
+import time
+import uuid
+import pickle
+import sqlite3
+import threading
+
+# Each user has a cache version. Entries and ETags are keyed by it, so invalidating
+# a user is a single version bump and every older entry simply stops being addressed.
+
+class _LRU:
+    """In-process LRU with a TTL per entry."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+class _MemoryBackend:
+    """Versions and entries live in this process only. Other workers catch up when the TTL runs out."""
+
+    def __init__(self, max_size, ttl):
+        self._versions = _LRU(max_size, ttl)
+        self._entries = _LRU(max_size, ttl)
+
+    def version(self, user_id):
+        version = self._versions.get(user_id)
+        if version is None:
+            version = uuid.uuid4().hex[:12]
+            self._versions.set(user_id, version)
+        return version
+
+    def bump(self, user_ids):
+        for user_id in user_ids:
+            self._versions.delete(user_id)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value):
+        self._entries.set(key, value)
+
+class _SQLiteBackend:
+    """Versions and entries in a SQLite file shared by every worker, with an in-process LRU in front for entries."""
+
+    def __init__(self, path, max_size, ttl):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._local = threading.local()
+        self._front = _LRU(max_size, ttl)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS versions (user_id TEXT PRIMARY KEY, version TEXT NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_expires_at ON entries (expires_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def version(self, user_id):
+        conn = self._conn()
+        row = conn.execute("SELECT version FROM versions WHERE user_id = ?", (str(user_id),)).fetchone()
+        if row:
+            return row[0]
+        conn.execute("INSERT OR IGNORE INTO versions (user_id, version) VALUES (?, ?)", (str(user_id), uuid.uuid4().hex[:12]))
+        return conn.execute("SELECT version FROM versions WHERE user_id = ?", (str(user_id),)).fetchone()[0]
+
+    def bump(self, user_ids):
+        self._conn().executemany(
+            "INSERT OR REPLACE INTO versions (user_id, version) VALUES (?, ?)",
+            [(str(user_id), uuid.uuid4().hex[:12]) for user_id in user_ids]
+        )
+
+    def get(self, key):
+        value = self._front.get(key)
+        if value is not None:
+            return value
+        row = self._conn().execute("SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        if row is None:
+            return None
+        value = pickle.loads(row[0])
+        self._front.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self._front.set(key, value)
+        conn = self._conn()
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                     (key, pickle.dumps(value), now + self.ttl))
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+
+_backend = None
+_backend_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+_stats_lock = threading.Lock()
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if Config.NOTIFICATION_CACHE_BACKEND == 'sqlite':
+                    _backend = _SQLiteBackend(Config.NOTIFICATION_CACHE_PATH, Config.NOTIFICATION_CACHE_SIZE, Config.NOTIFICATION_CACHE_TTL)
+                else:
+                    _backend = _MemoryBackend(Config.NOTIFICATION_CACHE_SIZE, Config.NOTIFICATION_CACHE_TTL)
+    return _backend
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def etag_for(user_id, limit, cursor):
+    """ETag of the user's current notifications page. Changes whenever the user is invalidated."""
+    user_id = str(user_id)
+    return f"n{user_id}.{_get_backend().version(user_id)}.{limit}.{cursor or 0}"
+
+def record_not_modified():
+    _count("not_modified")
+
+def get(etag):
+    value = _get_backend().get(etag)
+    _count("hits" if value is not None else "misses")
+    return value
+
+def store(etag, value):
+    _get_backend().set(etag, value)
+
+def invalidate_users(user_ids):
+    user_ids = {str(u) for u in user_ids}
+    if user_ids:
+        _get_backend().bump(user_ids)
+        with _stats_lock:
+            _stats["invalidations"] += len(user_ids)
+
+def invalidate_category(category):
+    """A new found item can only show up for owners of lost items in its category."""
+    owners = db.session.query(LostItem.user_id).filter(LostItem.category == category).distinct()
+    invalidate_users(row[0] for row in owners)
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0
+    stats["backend"] = Config.NOTIFICATION_CACHE_BACKEND
+    return stats
@@ -0,0 +1,167 @@
+from models import db, Match, LostItem
+from config import Config
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+import json
+import queue
+import threading
+import time
+
+# Delivery behind GET /api/items/notifications/stream (enabled with NOTIFICATION_STREAM).
+# Matches are stored by whichever process ran the job (a web worker or run_jobs.py), so every web process
+# runs one poller that reads the match rows stored since its last poll, for the users with an open stream
+# here, and queues them on those streams. One indexed query per process per interval, however many streams.
+# Events carry the match id, so a reconnecting EventSource resumes from Last-Event-ID (see backfill()).
+# Each open stream is a Subscription with a bounded queue; publish() never blocks the poller.
+
+class Subscription:
+    def __init__(self, user_id, max_size):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=max_size)
+        # Set when events were dropped because the client fell behind
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+_subscribers = {}
+_lock = threading.Lock()
+_stats = {"published": 0, "dropped": 0, "polls": 0}
+_app = None
+_poller = None
+
+def init_app(app):
+    global _app
+    _app = app
+
+def subscribe(user_id):
+    sub = Subscription(str(user_id), Config.NOTIFICATION_STREAM_QUEUE_SIZE)
+    with _lock:
+        _subscribers.setdefault(sub.user_id, set()).add(sub)
+    _start_poller()
+    return sub
+
+def unsubscribe(sub):
+    with _lock:
+        subs = _subscribers.get(sub.user_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del _subscribers[sub.user_id]
+
+def publish(user_id, event_type, data, event_id=None):
+    """Queues an event for every open stream of the user in this process. Returns the number of streams reached."""
+    with _lock:
+        subs = list(_subscribers.get(str(user_id), ()))
+    for sub in subs:
+        was_overflowed = sub.overflowed
+        sub.put((event_type, data, event_id))
+        with _lock:
+            _stats["published"] += 1
+            if sub.overflowed and not was_overflowed:
+                _stats["dropped"] += 1
+    return len(subs)
+
+def _matches_query(user_ids, after_id, up_to_id=None):
+    query = db.session.query(Match, LostItem.user_id).join(LostItem, Match.lost_id == LostItem.id).filter(
+        LostItem.user_id.in_(user_ids),
+        Match.id > after_id
+    ).options(joinedload(Match.lost_item), joinedload(Match.found_item))
+    if up_to_id is not None:
+        query = query.filter(Match.id <= up_to_id)
+    return query.order_by(Match.id)
+
+def backfill(sub, after_id):
+    """
+    Queues the user's matches stored after after_id (the client's Last-Event-ID), or a resync if there are
+    more than the stream's queue holds. Call after subscribe(), so nothing falls between the two.
+    """
+    rows = _matches_query([int(sub.user_id)], after_id).limit(Config.NOTIFICATION_STREAM_QUEUE_SIZE + 1).all()
+    if len(rows) > Config.NOTIFICATION_STREAM_QUEUE_SIZE:
+        sub.overflowed = True
+        return
+    for match, _ in rows:
+        sub.put(("match", match.to_dict(), match.id))
+
+def _newest_id():
+    return db.session.query(func.max(Match.id)).scalar() or 0
+
+def _start_poller():
+    """Starts this process's poller on the first subscription (in its request, so the first watermark predates the backfill)."""
+    global _poller
+    if _poller is not None or _app is None:
+        return
+    with _lock:
+        if _poller is not None:
+            return
+        _poller = threading.Thread(target=_poll_loop, args=(_newest_id(),), name="notification-poller", daemon=True)
+        _poller.start()
+
+def _poll_loop(last_id):
+    # Ids are compared against the highest one seen. SQLite reuses the highest id when that row is deleted
+    # (a pruned match), so a match stored right after such a delete can be missed; clients still see it
+    # in /notifications.
+    while True:
+        time.sleep(Config.NOTIFICATION_STREAM_POLL_INTERVAL)
+        try:
+            with _app.app_context():
+                newest = _newest_id()
+                with _lock:
+                    user_ids = [int(user_id) for user_id in _subscribers]
+                if user_ids and newest > last_id:
+                    for start in range(0, len(user_ids), 500): # SQLite variable limit
+                        for match, user_id in _matches_query(user_ids[start:start + 500], last_id, newest):
+                            publish(user_id, "match", match.to_dict(), match.id)
+                last_id = newest
+                with _lock:
+                    _stats["polls"] += 1
+        except Exception as e:
+            print(f"Notification poller error: {e}")
+
+def _format(event_type, data, event_id=None):
+    frame = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{frame}event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def stream(sub, heartbeat=None):
+    """
+    Generator of SSE frames for a subscription. Sends a comment line every heartbeat seconds
+    so proxies keep the connection open and dead clients are noticed on the next write.
+    """
+    heartbeat = heartbeat or Config.NOTIFICATION_STREAM_HEARTBEAT
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            event = sub.get(timeout=heartbeat)
+            if sub.overflowed:
+                # Events were lost; tell the client to refetch the list instead
+                sub.drain()
+                sub.overflowed = False
+                yield _format("resync", {})
+            elif event is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield _format(*event)
+    finally:
+        unsubscribe(sub)
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["subscribers"] = sum(len(subs) for subs in _subscribers.values())
+    return stats
@@ -0,0 +1,63 @@
+from app import app
+from models import LostItem, FoundItem
+from config import Config
+import vector_utils
+
+# Base collection -> (model, date column used for month partitions)
+COLLECTIONS = {
+    "lost_items": (LostItem, LostItem.date_lost),
+    "found_items": (FoundItem, FoundItem.date_found),
+    "lost_text": (LostItem, LostItem.date_lost),
+    "found_text": (FoundItem, FoundItem.date_found),
+}
+
+def partition_vectors(batch_size=1000):
+    """
+    Rebuilds the partitions for the current VECTOR_PARTITION setting from every existing vector:
+    the unpartitioned collection plus any partitions of an earlier scheme. Vectors indexed before
+    partitioning have no 'month' metadata; it's filled in from the item's date.
+    The source collections are left in place, so switching VECTOR_PARTITION back needs no rebuild.
+    """
+    if not Config.VECTOR_PARTITION:
+        print("VECTOR_PARTITION is not set, nothing to rebuild.")
+        return
+
+    store = vector_utils.get_store()
+    with app.app_context():
+        for base, (model, date_column) in COLLECTIONS.items():
+            existing = store.list_collections()
+            sources = [name for name in existing if name == base or name.startswith(f"{base}__")]
+            dates = {item_id: (category, day) for item_id, category, day in
+                     model.query.with_entities(model.id, model.category, date_column)}
+            written, orphans, seen, targets = 0, 0, set(), set()
+            for source in sources:
+                for ids, embeddings, metadatas in store.export(source, batch_size=batch_size):
+                    # {partition: (ids, embeddings, metadatas)}
+                    batches = {}
+                    for vid, embedding, metadata in zip(ids, embeddings, metadatas):
+                        item_id = vector_utils.item_id_from_vector_id(vid)
+                        if item_id not in dates:
+                            orphans += 1
+                            continue
+                        if vid in seen:
+                            continue
+                        seen.add(vid)
+                        category, day = dates[item_id]
+                        metadata = dict(metadata or {}, item_id=item_id, category=category,
+                                        month=vector_utils.month_key(day) or "")
+                        target = vector_utils.partition_name(base, metadata)
+                        if target == source:
+                            continue
+                        batch = batches.setdefault(target, ([], [], []))
+                        batch[0].append(vid)
+                        batch[1].append(embedding)
+                        batch[2].append(metadata)
+                    for target, (t_ids, t_embeddings, t_metadatas) in batches.items():
+                        store.upsert(target, t_ids, t_embeddings, t_metadatas)
+                        written += len(t_ids)
+                        targets.add(target)
+                print(f"{base}: read {source}")
+            print(f"{base}: {written} vector(s) written into {len(targets)} partition(s), {orphans} orphan(s) of deleted items skipped.")
+
+if __name__ == "__main__":
+    partition_vectors()
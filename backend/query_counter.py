@@ -0,0 +1,22 @@
+from flask import g, has_request_context
+from sqlalchemy import event
+from models import db
+
+def init_app(app):
+    """
+    Counts SQL statements per request and reports them in an X-Query-Count header.
+    Enabled by QUERY_COUNTER (TestingConfig); test_query_counts.py uses it to catch N+1 queries.
+    """
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        # Background job threads have no request context and aren't counted
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+
+    @app.after_request
+    def _report_query_count(response):
+        response.headers['X-Query-Count'] = str(g.get('query_count', 0))
+        return response
@@ -0,0 +1,93 @@
+from models import db, Match
+from config import Config
+import numpy as np
+
+# One ranking stage for every matching signal. A new item's candidates come from
+#   - the text index: items sharing a color, location or description word (text_index, scored by match_engine)
+#   - the ANN searches: photo vs photo, description vs description, description vs photo
+# and are merged into one feature row per candidate, cut to the category/date/status prefilter (an indexed SQL
+# read over the candidate ids only), scored with Config.MATCH_WEIGHTS and cut to the top k per lost item.
+
+FEATURES = ('color', 'location', 'description', 'vector', 'text_vector', 'cross_modal', 'date_gap')
+TEXT_FEATURES = ('color', 'location', 'description')
+VECTOR_FEATURES = ('vector', 'text_vector', 'cross_modal')
+
+def score(features, weights=None):
+    """Weighted sum of a candidate's features (missing and below-threshold signals count as 0)."""
+    weights = Config.MATCH_WEIGHTS if weights is None else weights
+    return round(sum(weights.get(name, 0) * (features.get(name) or 0) for name in FEATURES), 3)
+
+def text_score(features):
+    """The matching.text_score() of a candidate: its text rule points."""
+    return sum(features.get(name) or 0 for name in TEXT_FEATURES)
+
+class Candidates:
+    """
+    Deduped candidates of one query item: other item id -> feature row.
+    Every source merges with one dict lookup per candidate, so the cost is the number of hits, not the table size.
+    day: the query item's date, for the date gap
+    """
+
+    def __init__(self, day):
+        self.day = day
+        self.rows = {}
+
+    def _row(self, item_id):
+        row = self.rows.get(item_id)
+        if row is None:
+            row = dict.fromkeys(FEATURES)
+            row.update(color=0, location=0, description=0)
+            self.rows[item_id] = row
+        return row
+
+    def add_text(self, ids, features):
+        """match_engine.Corpus.features() output; only items with at least one text point become candidates."""
+        points = sum(features[name] for name in TEXT_FEATURES)
+        for i in np.flatnonzero(points).tolist():
+            row = self._row(int(ids[i]))
+            for name in TEXT_FEATURES:
+                row[name] = int(features[name][i])
+
+    def add(self, feature, hits):
+        """{item_id: similarity} from an ANN search."""
+        for item_id, similarity in hits.items():
+            self._row(item_id)[feature] = similarity
+
+    def __len__(self):
+        return len(self.rows)
+
+    def ids(self):
+        return list(self.rows)
+
+    def restrict(self, allowed):
+        """Keeps the candidates in allowed ({item_id: date}, the prefilter's result) and sets their date gap."""
+        self.rows = {item_id: row for item_id, row in self.rows.items() if item_id in allowed}
+        for item_id, row in self.rows.items():
+            row["date_gap"] = abs((allowed[item_id] - self.day).days)
+
+    def ranked(self, weights=None):
+        """[(score, item_id, features)] best first; ties go to the lower (older) id."""
+        ranked = [(score(row, weights), item_id, row) for item_id, row in self.rows.items()]
+        ranked.sort(key=lambda entry: (-entry[0], entry[1]))
+        return ranked
+
+def prune(lost_ids, k=None):
+    """
+    Deletes all but the k best matches of each lost item (Match.rank_score, unranked rows last). Caller commits.
+    Returns the ids of the deleted matches.
+    """
+    k = Config.MATCH_TOP_K if k is None else k
+    if not k or not lost_ids:
+        return set()
+    rows = db.session.query(Match.id, Match.lost_id).filter(Match.lost_id.in_(list(lost_ids))).order_by(
+        Match.lost_id, Match.rank_score.is_(None), Match.rank_score.desc(), Match.id
+    ).all()
+    kept = {}
+    deleted = set()
+    for match_id, lost_id in rows:
+        kept[lost_id] = kept.get(lost_id, 0) + 1
+        if kept[lost_id] > k:
+            deleted.add(match_id)
+    if deleted:
+        Match.query.filter(Match.id.in_(deleted)).delete(synchronize_session='fetch')
+    return deleted
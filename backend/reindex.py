@@ -0,0 +1,285 @@
+from config import Config
+# Warm-up is for servers: here it would load CLIP before the decoder pool forks (see _decoder_pool)
+Config.VECTOR_WARMUP = False
+from app import app
+from models import db, LostItem, FoundItem
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+import multiprocessing
+import argparse
+import json
+import os
+import time
+import numpy as np
+import image_store
+import image_preprocess
+import vector_utils
+import embedding_cache
+import jobs
+
+# Base collection -> item model
+COLLECTIONS = {
+    "lost_items": LostItem,
+    "found_items": FoundItem,
+    "lost_text": LostItem,
+    "found_text": FoundItem,
+}
+# Collections of item text embeddings (see jobs.item_text), one vector per item
+TEXT_COLLECTIONS = {"lost_text", "found_text"}
+
+def _decode(path):
+    """Runs in a pool process: image file -> RGB pixels at the encoder's input size, or None."""
+    try:
+        img = image_preprocess.prepare(path, short_side=Config.EMBED_IMAGE_SIZE,
+                                       max_side=Config.EMBED_IMAGE_MAX_SIDE, purpose='embedding')
+        return np.asarray(img)
+    except Exception as e:
+        print(f"Could not decode {path}: {e}")
+        return None
+
+def _sources(base, item):
+    """What each of the item's vectors in base is computed from: its image hashes, or its text."""
+    if base in TEXT_COLLECTIONS:
+        text = jobs.item_text(item)
+        return [text] if text else []
+    return list(item.images or [])
+
+def check(base, model):
+    """
+    Compares the item table with the vectors in the collection's active partitions.
+    Returns sets of vector ids (missing, orphaned, misplaced) plus the items to re-embed
+    and the deleted items whose vectors should go.
+      missing:   an image (or the text) of an existing item has no vector (e.g. add_item_vectors failed)
+      orphaned:  the item was deleted, the image index no longer exists, or a legacy bare-id vector
+      misplaced: the vector is in another partition than the item's category/month maps to now
+    """
+    store = vector_utils.get_store()
+    expected = {} # vector id -> partition
+    for item in model.query.yield_per(1000):
+        partition = vector_utils.partition_name(base, jobs.vector_metadata(item))
+        for n in range(len(_sources(base, item))):
+            expected[vector_utils.vector_id(item.id, n)] = partition
+    db.session.expunge_all()
+
+    indexed = {} # vector id -> partition
+    for name in vector_utils.partitions(base):
+        for ids, _, _ in store.export(name):
+            for vid in ids:
+                indexed[vid] = name
+
+    item_ids = {item_id for (item_id,) in model.query.with_entities(model.id)}
+    missing = expected.keys() - indexed.keys()
+    orphaned = indexed.keys() - expected.keys()
+    misplaced = {vid for vid in expected.keys() & indexed.keys() if expected[vid] != indexed[vid]}
+    deleted = {vector_utils.item_id_from_vector_id(vid) for vid in orphaned} - item_ids
+    repair = {vector_utils.item_id_from_vector_id(vid) for vid in missing | orphaned | misplaced} - deleted
+    return {
+        "items": len(item_ids),
+        "images": len(expected),
+        "vectors": len(indexed),
+        "missing": missing,
+        "orphaned": orphaned,
+        "misplaced": misplaced,
+        "repair": repair,
+        "deleted": deleted,
+    }
+
+def _unit(base):
+    return "text(s)" if base in TEXT_COLLECTIONS else "image(s)"
+
+def print_report(base, report):
+    def sample(vids):
+        return f" (e.g. {', '.join(sorted(vids)[:5])})" if vids else ""
+    print(f"{base}: {report['items']} item(s) with {report['images']} {_unit(base)}, {report['vectors']} vector(s) indexed")
+    print(f"  missing:   {len(report['missing'])}{sample(report['missing'])}")
+    print(f"  orphaned:  {len(report['orphaned'])}, {len(report['deleted'])} deleted item(s){sample(report['orphaned'])}")
+    print(f"  misplaced: {len(report['misplaced'])}{sample(report['misplaced'])}")
+    print(f"  {len(report['repair'])} item(s) to re-embed, {len(report['deleted'])} to remove")
+
+def load_checkpoint(mode):
+    path = Config.REINDEX_CHECKPOINT_PATH
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("mode") != mode or checkpoint.get("model") != Config.EMBED_MODEL:
+        print(f"Ignoring checkpoint of a different run ({checkpoint.get('mode')}, {checkpoint.get('model')}).")
+        return {}
+    return checkpoint.get("collections", {})
+
+def save_checkpoint(mode, progress):
+    path = Config.REINDEX_CHECKPOINT_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"mode": mode, "model": Config.EMBED_MODEL, "collections": progress}, f)
+    os.replace(tmp_path, path)
+
+def _chunks(base, model, after_id, chunk_size, only_ids=None):
+    """Yields the items after after_id in id order, chunk_size at a time, as (id, sources, metadata)."""
+    remaining = sorted(i for i in only_ids if i > after_id) if only_ids is not None else None
+    last_id = after_id
+    while True:
+        query = model.query.order_by(model.id)
+        if remaining is None:
+            items = query.filter(model.id > last_id).limit(chunk_size).all()
+        else:
+            ids, remaining = remaining[:chunk_size], remaining[chunk_size:]
+            items = query.filter(model.id.in_(ids)).all() if ids else []
+        if not items:
+            return
+        chunk = [(item.id, _sources(base, item), jobs.vector_metadata(item)) for item in items]
+        last_id = chunk[-1][0]
+        db.session.expunge_all()
+        yield chunk
+
+def _decoded(pool, chunks):
+    """
+    Submits each chunk's images to the pool one chunk ahead, so decoding overlaps encoding.
+    Images already in the embedding cache are not decoded at all.
+    """
+    pending = None
+    for chunk in chunks:
+        refs = [(item_id, n, metadata, image_hash) for item_id, hashes, metadata in chunk
+                for n, image_hash in enumerate(hashes)]
+        cached = embedding_cache.get_many(ref[3] for ref in refs)
+        todo = [i for i, ref in enumerate(refs) if ref[3] not in cached]
+        paths = [image_store.image_path(refs[i][3]) for i in todo]
+        arrays = pool.map(_decode, paths, chunksize=8) if pool else map(_decode, paths)
+        if pending:
+            yield pending
+        pending = (chunk, refs, cached, todo, arrays)
+    if pending:
+        yield pending
+
+def _texts(chunks):
+    """Same shape as _decoded() for text collections; there is nothing to decode."""
+    for chunk in chunks:
+        refs = [(item_id, 0, metadata, texts[0]) for item_id, texts, metadata in chunk if texts]
+        keys = [embedding_cache.key_for_text(ref[3]) for ref in refs]
+        hits = embedding_cache.get_many(keys)
+        cached = {ref[3]: hits[key] for ref, key in zip(refs, keys) if key in hits}
+        todo = [i for i, ref in enumerate(refs) if ref[3] not in cached]
+        yield chunk, refs, cached, todo, [refs[i][3] for i in todo]
+
+def reindex_collection(base, model, report, mode, progress, pool, chunk_size, batch_size):
+    store = vector_utils.get_store()
+    for item_id in sorted(report["deleted"]):
+        vector_utils.delete_from_collection(base, item_id)
+    # Items whose stale or misplaced vectors have to go before they are written again
+    stale = {vector_utils.item_id_from_vector_id(vid) for vid in report["orphaned"] | report["misplaced"]}
+
+    only_ids = report["repair"] if mode == 'missing' else None
+    after_id = progress.get(base, 0)
+    if only_ids is not None:
+        total = sum(1 for item_id in only_ids if item_id > after_id)
+    else:
+        total = model.query.filter(model.id > after_id).count()
+    if after_id:
+        print(f"{base}: resuming after item {after_id}")
+    done, images, failed, from_cache = 0, 0, 0, 0
+    start = time.perf_counter()
+    chunks = _chunks(base, model, after_id, chunk_size, only_ids)
+    is_text = base in TEXT_COLLECTIONS
+    for chunk, refs, cached, todo, inputs in _texts(chunks) if is_text else _decoded(pool, chunks):
+        vectors = [cached[ref[3]].tolist() if ref[3] in cached else None for ref in refs]
+        if is_text:
+            for i, vector in zip(todo, vector_utils.get_text_embeddings(inputs, batch_size=batch_size)):
+                vectors[i] = vector
+        else:
+            valid = [(i, array) for i, array in zip(todo, inputs) if array is not None]
+            if valid:
+                encoded = vector_utils.get_embeddings(
+                    [Image.fromarray(array) for _, array in valid], batch_size=batch_size,
+                    keys=[refs[i][3] for i, _ in valid]
+                )
+                for (i, _), vector in zip(valid, encoded):
+                    vectors[i] = vector
+
+        # {partition: (ids, embeddings, metadatas)}, one upsert per partition per chunk
+        batches = {}
+        for (item_id, n, metadata, _), vector in zip(refs, vectors):
+            if vector is None:
+                failed += 1
+                continue
+            batch = batches.setdefault(vector_utils.partition_name(base, metadata), ([], [], []))
+            batch[0].append(vector_utils.vector_id(item_id, n))
+            batch[1].append(vector)
+            batch[2].append(dict(metadata, item_id=item_id))
+        for item_id, _, _ in chunk:
+            if item_id in stale:
+                vector_utils.delete_from_collection(base, item_id)
+        for partition, (ids, embeddings, metadatas) in batches.items():
+            store.upsert(partition, ids, embeddings, metadatas)
+
+        done += len(chunk)
+        images += len(refs)
+        from_cache += len(cached)
+        progress[base] = chunk[-1][0]
+        save_checkpoint(mode, progress)
+        elapsed = time.perf_counter() - start
+        rate = images / elapsed if elapsed else 0
+        eta = (total - done) * (elapsed / done) if done else 0
+        print(f"{base}: {done}/{total} items, {images} {_unit(base)} ({failed} failed), {rate:.1f}/s, ETA {eta:.0f}s")
+    print(f"{base}: done, {done} item(s), {images} {_unit(base)} ({from_cache} from the embedding cache), "
+          f"{failed} could not be embedded.")
+
+def _decoder_pool(workers):
+    """
+    Image decode processes, started right away: forked while this process holds no CLIP model,
+    vector store client or their threads, so the decoders inherit none of them.
+    """
+    if workers <= 1:
+        return None
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    # A fork pool starts all of its processes on the first submit
+    pool.submit(os.getpid).result()
+    return pool
+
+def reindex(collections=None, mode='all', dry_run=False, restart=False, chunk_size=256, batch_size=128, workers=None):
+    """
+    Rebuilds item vectors from the images on disk and the item texts.
+    mode 'all' re-embeds every item (after changing the model or backend); 'missing' only repairs
+    what the consistency check finds. Both remove vectors of deleted items and stale images first.
+    Progress is checkpointed after every chunk; re-running the same command resumes.
+    """
+    collections = collections or list(COLLECTIONS)
+    workers = os.cpu_count() if workers is None else workers
+    pool = None if dry_run else _decoder_pool(workers)
+    try:
+        with app.app_context():
+            reports = {}
+            for base in collections:
+                reports[base] = check(base, COLLECTIONS[base])
+                print_report(base, reports[base])
+            if dry_run:
+                return reports
+
+            progress = {} if restart else load_checkpoint(mode)
+            for base in collections:
+                reindex_collection(base, COLLECTIONS[base], reports[base], mode, progress,
+                                   pool, chunk_size, batch_size)
+            if os.path.exists(Config.REINDEX_CHECKPOINT_PATH):
+                os.remove(Config.REINDEX_CHECKPOINT_PATH)
+            print("Run build_matches.py to rescore matches against the new vectors.")
+            return reports
+    finally:
+        if pool:
+            pool.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed item images and texts and rebuild the vector collections.")
+    parser.add_argument('collections', nargs='*', help=f"any of {', '.join(COLLECTIONS)} (default: all)")
+    parser.add_argument('--missing', action='store_true', help="only repair missing, orphaned and misplaced vectors")
+    parser.add_argument('--dry-run', action='store_true', help="print the consistency report and exit")
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint of an interrupted run")
+    parser.add_argument('--chunk-size', type=int, default=256, help="items read and written per step")
+    parser.add_argument('--batch-size', type=int, default=128, help="images or texts per CLIP batch")
+    parser.add_argument('--workers', type=int, default=None, help="image decode processes (default: CPU count)")
+    args = parser.parse_args()
+    unknown = set(args.collections) - set(COLLECTIONS)
+    if unknown:
+        parser.error(f"unknown collection(s): {', '.join(sorted(unknown))}")
+    reindex(args.collections, 'missing' if args.missing else 'all', args.dry_run, args.restart,
+            args.chunk_size, args.batch_size, args.workers)
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, CCTVRequest, User, CCTVFootage
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
@@ -18,6 +19,10 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _listing_options():
+    # to_dict() reads the requester and every footage, load them up front instead of 2 queries per request
+    return (joinedload(CCTVRequest.user), selectinload(CCTVRequest.footages))
+
 @cctv_bp.route('/request', methods=['POST'])
 @jwt_required()
 def create_request():
@@ -73,7 +78,9 @@ def create_request():
 def get_my_requests():
     try:
         current_user_id = get_jwt_identity()
-        requests = CCTVRequest.query.filter_by(user_id=current_user_id).order_by(CCTVRequest.created_at.desc()).all()
+        requests = CCTVRequest.query.filter_by(user_id=current_user_id).options(
+            *_listing_options()
+        ).order_by(CCTVRequest.created_at.desc()).all()
         return jsonify([req.to_dict() for req in requests]), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -83,7 +90,9 @@ def get_my_requests():
 @admin_required
 def get_all_requests():
     try:
-        requests = CCTVRequest.query.order_by(CCTVRequest.created_at.desc()).all()
+        requests = CCTVRequest.query.options(
+            *_listing_options()
+        ).order_by(CCTVRequest.created_at.desc()).all()
         return jsonify([req.to_dict() for req in requests]), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
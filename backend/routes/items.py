@@ -1,9 +1,17 @@
-from flask import Blueprint, request, jsonify
-from models import db, LostItem, FoundItem, User
-from datetime import datetime
+from flask import Blueprint, request, jsonify, send_file, current_app
+from models import db, LostItem, FoundItem, User, Match, EmbeddingJob, image_urls
+from datetime import datetime, date, time
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import vector_utils
-import ast
+from sqlalchemy import and_, or_, type_coerce
+from sqlalchemy.orm import joinedload
+import jobs
+import notification_cache
+import notification_stream
+import image_store
+import text_index
+import binascii
+import base64
+import os
 
 items_bp = Blueprint('items', __name__)
 
@@ -20,6 +28,11 @@ def report_lost():
             print(f"DEBUG: Missing field: {field}") # Debugging
             return jsonify({"msg": f"Missing field: {field}"}), 400
 
+    try:
+        image_hashes = image_store.save_images(data.get('images', []))
+    except (binascii.Error, ValueError, TypeError):
+        return jsonify({"msg": "Invalid image data"}), 400
+
     try:
         new_item = LostItem(
             category=data['category'],
@@ -35,43 +48,26 @@ def report_lost():
             owner_name=data['ownerName'],
             email=data['email'],
             phone=data['phone'],
-            images=str(data.get('images', [])), # Store as string for now
+            images=image_hashes,
             user_id=current_user_id
         )
 
         db.session.add(new_item)
+        db.session.flush()
+        text_index.add(new_item)
+        job = jobs.enqueue('lost', new_item.id)
         db.session.commit()
+        jobs.notify()
 
-        # Vectorize image if available
-        images_list = data.get('images', [])
-        if images_list and len(images_list) > 0:
-            print(f"Vectorizing lost item {new_item.id}...")
-            # Use the first image
-            first_image = images_list[0]
-            embedding = vector_utils.get_embedding(first_image)
-            
-            if embedding is not None:
-                vector_utils.add_to_collection(
-                    collection_name="lost_items",
-                    item_id=new_item.id,
-                    embedding=embedding,
-                    metadata={
-                        "category": new_item.category,
-                        "color": new_item.color or "",
-                        "user_id": current_user_id
-                    }
-                )
-                print("Vector added to lost_items.")
-
-        return jsonify({"msg": "Lost item reported successfully", "id": new_item.id}), 201
+        # Embedding and matching run in the background, poll /jobs/<job_id> for progress
+        return jsonify({"msg": "Lost item reported successfully", "id": new_item.id, "job_id": job.id}), 202
     except Exception as e:
         print(f"Error in report_lost: {e}")
         return jsonify({"msg": str(e)}), 500
 
 @items_bp.route('/lost', methods=['GET'])
 def get_lost_items():
-    items = LostItem.query.order_by(LostItem.created_at.desc()).all()
-    return jsonify([item.to_dict() for item in items]), 200
+    return _list_items(LostItem, LOST_FIELDS, LostItem.date_lost, LostItem.location)
 
 @items_bp.route('/found', methods=['POST'])
 @jwt_required()
@@ -86,6 +82,11 @@ def report_found():
             print(f"DEBUG: Missing field: {field} (Found Item)") # Debugging
             return jsonify({"msg": f"Missing field: {field}"}), 400
 
+    try:
+        image_hashes = image_store.save_images(data.get('images', []))
+    except (binascii.Error, ValueError, TypeError):
+        return jsonify({"msg": "Invalid image data"}), 400
+
     try:
         new_item = FoundItem(
             category=data['category'],
@@ -97,168 +98,237 @@ def report_found():
             finder_name=data['finderName'],
             contact=data['contact'],
             consent=data.get('consent', False),
-            images=str(data.get('images', [])), # Store as string for now
+            images=image_hashes,
             user_id=current_user_id
         )
 
         db.session.add(new_item)
+        db.session.flush()
+        text_index.add(new_item)
+        job = jobs.enqueue('found', new_item.id)
         db.session.commit()
+        jobs.notify()
 
-        # Vectorize image if available
-        images_list = data.get('images', [])
-        if images_list and len(images_list) > 0:
-            print(f"Vectorizing found item {new_item.id}...")
-            first_image = images_list[0]
-            embedding = vector_utils.get_embedding(first_image)
-            if embedding is not None:
-                vector_utils.add_to_collection(
-                    collection_name="found_items",
-                    item_id=new_item.id,
-                    embedding=embedding,
-                    metadata={
-                        "category": new_item.category,
-                        "color": new_item.color or "",
-                        "user_id": current_user_id
-                    }
-                )
-                print("Vector added to found_items.")
-
-        return jsonify({"msg": "Found item reported successfully", "id": new_item.id}), 201
+        return jsonify({"msg": "Found item reported successfully", "id": new_item.id, "job_id": job.id}), 202
     except Exception as e:
         print(f"Error in report_found: {e}")
         return jsonify({"msg": str(e)}), 500
 
 @items_bp.route('/found', methods=['GET'])
 def get_found_items():
-    items = FoundItem.query.order_by(FoundItem.created_at.desc()).all()
-    return jsonify([item.to_dict() for item in items]), 200
+    return _list_items(FoundItem, FOUND_FIELDS, FoundItem.date_found, FoundItem.location_found)
+
+# Fields each list endpoint can project with ?fields=, same keys as to_dict()
+LOST_FIELDS = ('id', 'category', 'name', 'description', 'color', 'brand', 'serial', 'date_lost', 'time_lost',
+               'location', 'landmark', 'owner_name', 'email', 'phone', 'images', 'thumbnails', 'user_id',
+               'status', 'created_at')
+FOUND_FIELDS = ('id', 'category', 'description', 'color', 'date_found', 'location_found', 'custody',
+                'finder_name', 'contact', 'consent', 'images', 'thumbnails', 'status', 'created_at')
+
+def _encode_cursor(created_at_raw, item_id):
+    return base64.urlsafe_b64encode(f"{created_at_raw}|{item_id}".encode()).decode()
+
+def _decode_cursor(cursor):
+    created_at_raw, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+    return created_at_raw, int(item_id)
+
+def _serialize_field(field, value):
+    # Mirrors the conversions in the models' to_dict()
+    if field == 'images':
+        return image_urls(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (date, time)):
+        return str(value)
+    return value
+
+def _list_items(model, allowed_fields, date_column, location_column):
+    """
+    Newest-first listing with keyset pagination on (created_at, id).
+    Query: limit, cursor (from X-Next-Cursor), fields=a,b,c, category, status,
+           date_from/date_to (YYYY-MM-DD), location (substring match)
+    """
+    args = request.args
+    try:
+        limit = min(max(int(args.get('limit', 50)), 1), 200)
+        date_from = datetime.strptime(args['date_from'], '%Y-%m-%d').date() if args.get('date_from') else None
+        date_to = datetime.strptime(args['date_to'], '%Y-%m-%d').date() if args.get('date_to') else None
+        cursor = _decode_cursor(args['cursor']) if args.get('cursor') else None
+    except (ValueError, binascii.Error):
+        return jsonify({"msg": "Invalid limit, date or cursor"}), 400
+
+    fields = None
+    if args.get('fields'):
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in allowed_fields]
+        if unknown:
+            return jsonify({"msg": f"Unknown field(s): {', '.join(unknown)}"}), 400
+
+    # Compare created_at as stored text: server_default timestamps have no microseconds,
+    # and binding a datetime would never compare equal to them
+    created_at_raw = type_coerce(model.created_at, db.String)
+
+    if fields:
+        columns = {'images' if f == 'thumbnails' else f for f in fields} | {'id'}
+        query = db.session.query(*[getattr(model, c) for c in sorted(columns)], created_at_raw.label('cursor_created_at'))
+    else:
+        query = db.session.query(model, created_at_raw.label('cursor_created_at'))
+
+    if args.get('category'):
+        query = query.filter(model.category == args['category'])
+    if args.get('status'):
+        query = query.filter(model.status == args['status'])
+    if date_from:
+        query = query.filter(date_column >= date_from)
+    if date_to:
+        query = query.filter(date_column <= date_to)
+    if args.get('location'):
+        query = query.filter(location_column.ilike(f"%{args['location']}%"))
+    if cursor:
+        query = query.filter(or_(
+            created_at_raw < cursor[0],
+            and_(created_at_raw == cursor[0], model.id < cursor[1])
+        ))
+
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if fields:
+        items = []
+        for row in rows:
+            values = row._mapping
+            items.append({
+                f: image_urls(values['images'], 'thumb') if f == 'thumbnails' else _serialize_field(f, values[f])
+                for f in fields
+            })
+    else:
+        items = [row[0].to_dict() for row in rows]
+
+    response = jsonify(items)
+    if has_more:
+        last = rows[-1]
+        response.headers['X-Next-Cursor'] = _encode_cursor(last.cursor_created_at, last._mapping['id'] if fields else last[0].id)
+    return response, 200
+
+@items_bp.route('/images/<image_hash>', methods=['GET'])
+def get_image(image_hash):
+    """Serves a stored image or its thumbnail (?size=thumb). Content never changes for a hash, so cache forever."""
+    if not image_store.is_hash(image_hash):
+        return jsonify({"msg": "Invalid image id"}), 400
+    if not os.path.exists(image_store.image_path(image_hash)):
+        return jsonify({"msg": "Image not found"}), 404
+
+    if request.args.get('size') == 'thumb':
+        try:
+            path = image_store.ensure_thumbnail(image_hash)
+        except Exception as e:
+            # Stored before uploads were verified, or damaged since
+            print(f"Could not make thumbnail of {image_hash}: {e}")
+            return jsonify({"msg": "Stored file is not a readable image"}), 415
+        mimetype = 'image/jpeg'
+        etag = f"{image_hash}-thumb"
+    else:
+        path = image_store.image_path(image_hash)
+        mimetype = image_store.sniff_mimetype(path)
+        etag = image_hash
+
+    # conditional=True handles If-None-Match and Range requests
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@items_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job_status(job_id):
+    job = db.session.get(EmbeddingJob, job_id)
+    if not job:
+        return jsonify({"msg": "Job not found"}), 404
+    # Only the reporter may see the job (and its last_error); other users get the same 404 as a missing id
+    model = jobs.ITEM_TYPES[job.item_type][0]
+    item = db.session.get(model, job.item_id)
+    if item is None or str(item.user_id) != str(get_jwt_identity()):
+        return jsonify({"msg": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
 
 @items_bp.route('/notifications', methods=['GET'])
 @jwt_required()
 def get_notifications():
+    """
+    Returns the current user's matches, newest first.
+    Matches are computed when items are reported; this is a single indexed read.
+    Pagination: ?limit=N&cursor=<match id>, next cursor is sent in X-Next-Cursor.
+    Pages are cached per user and carry an ETag; a poll with a matching If-None-Match gets a 304.
+    The cache is invalidated by the embedding jobs when new matches can exist (see notification_cache.py).
+    """
     current_user_id = get_jwt_identity()
-    
-    # Get all lost items reported by current user
-    my_lost_items = LostItem.query.filter_by(user_id=current_user_id).all()
-    
-    notifications = []
-    processed_match_ids = set() # To avoid duplicates if matched by both logic and vector
-    
-    for lost in my_lost_items:
-        # --- Logic 1: Basic Database Matching ---
-        # Hard filters: Category + Date (Found must be >= Lost)
-        potential_db_matches = FoundItem.query.filter(
-            FoundItem.category == lost.category,
-            FoundItem.date_found >= lost.date_lost
-        ).all()
-        
-        for found in potential_db_matches:
-            match_score = 0
-            
-            # 1. Color matching (Partial/Fuzzy)
-            if found.color and lost.color:
-                lost_colors = [c.strip().lower() for c in lost.color.split(',')]
-                found_colors = [c.strip().lower() for c in found.color.split(',')]
-                # Check for any overlap
-                if any(c in found_colors for c in lost_colors) or any(c in lost_colors for c in found_colors):
-                    match_score += 2
-                elif lost.color.lower() in found.color.lower() or found.color.lower() in lost.color.lower():
-                    match_score += 1
-            
-            # 2. Location matching (Keyword overlap)
-            if found.location_found and lost.location:
-                lost_loc = lost.location.lower()
-                found_loc = found.location_found.lower()
-                if lost_loc == found_loc:
-                    match_score += 3
-                elif lost_loc in found_loc or found_loc in lost_loc:
-                    match_score += 1
-
-            # 3. Description overlap (Simple but better than before)
-            if found.description and lost.description:
-                l_desc = lost.description.lower().split()
-                f_desc = found.description.lower().split()
-                overlap = set(l_desc) & set(f_desc)
-                # Ignore common words
-                stopwords = {'a', 'an', 'the', 'is', 'it', 'with', 'and', 'on', 'my'}
-                overlap = {w for w in overlap if w not in stopwords}
-                if len(overlap) >= 2:
-                    match_score += 2
-                elif len(overlap) >= 1:
-                    match_score += 1
-                
-            # Only consider text match if threshold met
-            if match_score >= 2:
-                match_key = f"{lost.id}-{found.id}"
-                if match_key not in processed_match_ids:
-                    notifications.append({
-                        "type": "match",
-                        "match_method": "text",
-                        "lost_item": lost.to_dict(),
-                        "found_item": found.to_dict(),
-                        "score": match_score
-                    })
-                    processed_match_ids.add(match_key)
-
-        # --- Logic 2: Vector Similarity Matching (Image) ---
-        try:
-            lost_images_str = lost.images
-            lost_images = []
-            if lost_images_str:
-                try:
-                    lost_images = ast.literal_eval(lost_images_str)
-                except:
-                    pass
-            
-            if lost_images and len(lost_images) > 0:
-                lost_coll = vector_utils.get_collection("lost_items")
-                existing = lost_coll.get(ids=[str(lost.id)], include=['embeddings'])
-                
-                query_embedding = None
-                if existing.get('embeddings') is not None and len(existing['embeddings']) > 0:
-                    query_embedding = existing['embeddings'][0]
-                else:
-                    query_embedding = vector_utils.get_embedding(lost_images[0])
-                
-                if query_embedding is not None:
-                    # Search in 'found_items' with category filter
-                    # This DRASTICALLY improves accuracy
-                    vector_matches = vector_utils.search_collection(
-                        collection_name="found_items",
-                        query_embedding=query_embedding,
-                        n_results=5,
-                        threshold=0.5, # Restored for precision
-                        where={"category": lost.category}
-                    )
-                    
-                    for v_match in vector_matches:
-                        found_id = int(v_match['id'])
-                        found_item = FoundItem.query.get(found_id)
-                        
-                        if found_item and found_item.date_found >= lost.date_lost:
-                            match_key = f"{lost.id}-{found_item.id}"
-                            
-                            existing_notif = next((n for n in notifications if 
-                                                 n['lost_item']['id'] == lost.id and 
-                                                 n['found_item']['id'] == found_item.id), None)
-                            
-                            if existing_notif:
-                                existing_notif['match_method'] = "hybrid"
-                                existing_notif['vector_score'] = v_match['score']
-                                existing_notif['score'] += 5 # Massive boost for visual confirmation
-                            else:
-                                notifications.append({
-                                    "type": "match",
-                                    "match_method": "visual",
-                                    "lost_item": lost.to_dict(),
-                                    "found_item": found_item.to_dict(),
-                                    "score": 5,
-                                    "vector_score": v_match['score']
-                                })
-                                processed_match_ids.add(match_key)
 
-        except Exception as e:
-            print(f"Error in vector matching for lost item {lost.id}: {e}")
-            continue
-                
-    return jsonify(notifications), 200
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        cursor = request.args.get('cursor', type=int)
+    except ValueError:
+        return jsonify({"msg": "Invalid limit"}), 400
+
+    etag = notification_cache.etag_for(current_user_id, limit, cursor)
+    if etag in request.if_none_match:
+        notification_cache.record_not_modified()
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    cached = notification_cache.get(etag)
+    if cached is None:
+        query = Match.query.join(LostItem, Match.lost_id == LostItem.id).filter(
+            LostItem.user_id == current_user_id
+        ).options(
+            joinedload(Match.lost_item),
+            joinedload(Match.found_item)
+        )
+        if cursor:
+            query = query.filter(Match.id < cursor)
+
+        matches = query.order_by(Match.id.desc()).limit(limit + 1).all()
+        has_more = len(matches) > limit
+        matches = matches[:limit]
+
+        body = current_app.json.dumps([m.to_dict() for m in matches])
+        next_cursor = str(matches[-1].id) if has_more else None
+        cached = (body, next_cursor)
+        notification_cache.store(etag, cached)
+
+    body, next_cursor = cached
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    if current_app.config.get('NOTIFICATION_STREAM'):
+        # Tells the client it can subscribe instead of polling
+        response.headers['X-Notification-Stream'] = '1'
+    return response, 200
+
+@items_bp.route('/notifications/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_notifications():
+    """
+    Server-Sent Events feed of the current user's new matches, read from the match table by this process's poller.
+    EventSource can't set headers, so the token may be passed as ?jwt=<token>.
+    Starts after the Last-Event-ID header sent on reconnect, or ?after=<match id> (the newest one the client has).
+    Events: 'match' (same shape as a /notifications entry, id = match id) and 'resync' (refetch /notifications).
+    """
+    if not current_app.config.get('NOTIFICATION_STREAM'):
+        return jsonify({"msg": "Notification stream is disabled"}), 404
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after') or 0)
+    except ValueError:
+        return jsonify({"msg": "Invalid event id"}), 400
+
+    sub = notification_stream.subscribe(get_jwt_identity())
+    if after:
+        notification_stream.backfill(sub, after)
+    response = current_app.response_class(notification_stream.stream(sub), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
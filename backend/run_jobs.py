@@ -0,0 +1,21 @@
+import os
+import sys
+from config import Config
+# Invalidations from this process must reach the web workers' notification cache
+if 'NOTIFICATION_CACHE_BACKEND' not in os.environ:
+    Config.NOTIFICATION_CACHE_BACKEND = 'sqlite'
+elif Config.NOTIFICATION_CACHE_BACKEND == 'memory':
+    sys.exit("NOTIFICATION_CACHE_BACKEND=memory can't be invalidated from run_jobs.py; use sqlite")
+from app import app
+import jobs
+
+if __name__ == "__main__":
+    # Usage: python run_jobs.py [workers]
+    # Runs the embedding job pool in its own process, for web servers started with JOB_WORKERS=0 (gevent workers).
+    # Jobs are claimed atomically, so any number of these processes can share the queue.
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else (app.config['JOB_WORKERS'] or 2)
+    app.config['JOB_WORKERS'] = workers
+    try:
+        jobs.run_workers()
+    except KeyboardInterrupt:
+        print("Stopped.")
@@ -0,0 +1,19 @@
+from sqlalchemy import event
+from models import db
+
+def register_pragmas(engine, pragmas):
+    """Runs PRAGMA statements on every new SQLite connection the engine opens."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def init_app(app):
+    # Must run before the first connection is opened, i.e. before db.create_all()
+    with app.app_context():
+        register_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS') or {})
@@ -40,7 +40,7 @@ def test_report_lost(token):
     headers = {"Authorization": f"Bearer {token}"}
     res = requests.post(f"{BASE_URL}/items/lost", json=payload, headers=headers)
     
-    if res.status_code == 201:
+    if res.status_code == 202:
         print(f"Report Lost: SUCCESS - ID: {res.json().get('id')}")
         return res.json().get('id')
     else:
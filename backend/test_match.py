@@ -37,14 +37,20 @@ def test_matching(token):
     headers = {"Authorization": f"Bearer {token}"}
     res = requests.post(f"{BASE_URL}/items/found", json=payload, headers=headers)
     
-    if res.status_code == 201:
+    if res.status_code == 202:
         print(f"Report Found: SUCCESS - ID: {res.json().get('id')}")
     else:
         print(f"Report Found: FAILED - {res.status_code} - {res.text}")
         return
 
-    print("\nWaiting for vector processing (if any async)...")
-    time.sleep(2)
+    print("\nWaiting for vector processing...")
+    job_id = res.json().get('job_id')
+    for _ in range(60):
+        job = requests.get(f"{BASE_URL}/items/jobs/{job_id}", headers=headers).json()
+        if job.get('status') in ('done', 'failed'):
+            break
+        time.sleep(1)
+    print(f"Job {job_id}: {job.get('status')} after {job.get('attempts')} attempt(s)")
 
     print("\nChecking Notifications for Matches...")
     res = requests.get(f"{BASE_URL}/items/notifications", headers=headers)
@@ -0,0 +1,66 @@
+import os
+os.environ.setdefault('APP_ENV', 'testing')
+
+from datetime import date, time
+from flask_jwt_extended import create_access_token
+from app import app
+from models import db, User, LostItem, FoundItem, Match, CCTVRequest, CCTVFootage
+import notification_cache
+
+ENDPOINTS = [
+    "/api/items/notifications",
+    "/api/items/lost",
+    "/api/items/found",
+    "/api/cctv/my-requests",
+    "/api/cctv/admin/requests",
+]
+
+def seed(n):
+    """Fresh database where every listing endpoint returns about n rows."""
+    db.drop_all()
+    db.create_all()
+    admin = User(username="Admin", email="admin@example.com", password_hash="x", role="admin")
+    db.session.add(admin)
+    db.session.flush()
+    for i in range(n):
+        lost = LostItem(category="Bags", name=f"bag {i}", description="black bag", color="black",
+                        date_lost=date(2026, 1, 1), location="Library", owner_name="Admin",
+                        email="admin@example.com", phone="1", images=[], user_id=admin.id)
+        found = FoundItem(category="Bags", description="black bag", color="black", date_found=date(2026, 1, 2),
+                          location_found="Library", finder_name="F", contact="c", images=[], user_id=admin.id)
+        db.session.add_all([lost, found])
+        db.session.flush()
+        db.session.add(Match(lost_id=lost.id, found_id=found.id, text_score=7, method="text"))
+        request = CCTVRequest(location="Gate", date_request=date(2026, 1, 1), start_time=time(9, 0),
+                              end_time=time(10, 0), user_id=admin.id)
+        db.session.add(request)
+        db.session.flush()
+        db.session.add_all([CCTVFootage(request_id=request.id, file_path=f"/f/{i}/{k}") for k in range(2)])
+    db.session.commit()
+    notification_cache.invalidate_users([admin.id])
+    return create_access_token(identity=str(admin.id))
+
+def query_counts(n):
+    with app.app_context():
+        token = seed(n)
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    counts = {}
+    for url in ENDPOINTS:
+        res = client.get(url, headers=headers)
+        assert res.status_code == 200, f"{url}: {res.status_code} {res.get_data(as_text=True)}"
+        assert len(res.get_json()) == n, f"{url}: expected {n} rows, got {len(res.get_json())}"
+        counts[url] = int(res.headers['X-Query-Count'])
+    return counts
+
+def test_query_counts_do_not_grow():
+    small, large = query_counts(3), query_counts(30)
+    failed = False
+    for url in ENDPOINTS:
+        ok = small[url] == large[url]
+        failed = failed or not ok
+        print(f"{url:<28} 3 rows: {small[url]} queries, 30 rows: {large[url]} queries  {'OK' if ok else 'FAILED (N+1)'}")
+    assert not failed, "Query count grows with result size"
+
+if __name__ == "__main__":
+    test_query_counts_do_not_grow()
@@ -0,0 +1,84 @@
+import os
+os.environ.setdefault('APP_ENV', 'testing')
+
+from datetime import date
+from app import app
+from config import Config
+from models import db, User, LostItem, FoundItem
+from matching import text_score
+import match_engine
+import text_index
+
+LOST = dict(color="green", location="Block A", description="keys")
+
+# (color, location, description) of found items the lost item above must meet: each scores text points
+RECALL = [
+    ("greenish", "Block A-101", "keys,"), # hyphenated location, word followed by a comma
+    ("green", "Block A Room 101", "umbrella"), # location inside a longer one
+    ("black, green", "Gym", "umbrella"), # color list
+    ("dark green", "Gym", "umbrella"), # color inside a longer one
+    ("red", "block a", "umbrella"), # same location, other case
+]
+# ...and the ones it must not: nothing in common, or a location that only shares a word
+UNRELATED = [
+    ("red", "Block B", "umbrella"),
+    ("red", "Gym", "wallet"),
+]
+
+def seed(found_fields):
+    db.drop_all()
+    db.create_all()
+    match_engine.clear()
+    user = User(username="u", email="u@example.com", password_hash="x")
+    db.session.add(user)
+    db.session.flush()
+    lost = LostItem(category="Keys", name="keys", date_lost=date(2026, 1, 1), owner_name="o", email="e", phone="p",
+                    images=[], user_id=user.id, **LOST)
+    db.session.add(lost)
+    found = []
+    for color, location, description in found_fields:
+        item = FoundItem(category="Keys", color=color, location_found=location, description=description,
+                         date_found=date(2026, 1, 2), finder_name="f", contact="c", images=[], user_id=user.id)
+        db.session.add(item)
+        found.append(item)
+    db.session.flush()
+    for item in [lost] + found:
+        text_index.add(item)
+    db.session.commit()
+    return lost, found
+
+def candidate_points(lost):
+    """{found_id: text points} of the found items the index returns for lost."""
+    ids, features = match_engine.features_lost(lost)
+    total = features["color"] + features["location"] + features["description"]
+    return dict(zip(ids.tolist(), total.tolist()))
+
+def test_index_finds_every_scoring_pair():
+    with app.app_context():
+        lost, found = seed(RECALL + UNRELATED)
+        points = candidate_points(lost)
+        for item, fields in zip(found, RECALL + UNRELATED):
+            expected = text_score(lost, item)
+            if fields in RECALL:
+                assert expected > 0, f"{fields} should score"
+                assert points.get(item.id) == expected, f"{fields}: index gave {points.get(item.id)}, text_score {expected}"
+            else:
+                assert expected == 0 and item.id not in points, f"{fields} should not be a candidate"
+        print(f"{len(RECALL)} scoring pairs found with their text_score, {len(UNRELATED)} unrelated left out  OK")
+
+def test_feature_cache_is_bounded():
+    size = Config.MATCH_FEATURE_CACHE_SIZE
+    Config.MATCH_FEATURE_CACHE_SIZE = 2
+    try:
+        with app.app_context():
+            lost, _ = seed(RECALL)
+            first, second = candidate_points(lost), candidate_points(lost)
+            assert first == second and len(first) == len(RECALL)
+            assert len(match_engine._cache['found']) <= 2
+        print("feature cache capped at 2 items, scores unchanged  OK")
+    finally:
+        Config.MATCH_FEATURE_CACHE_SIZE = size
+
+if __name__ == "__main__":
+    test_index_finds_every_scoring_pair()
+    test_feature_cache_is_bounded()
@@ -0,0 +1,135 @@
+from models import db, LostItem, FoundItem, LostItemToken, FoundItemToken
+from sqlalchemy import select
+import re
+
+# Inverted index over the fields the text rules compare (matching.text_score): color, location and description.
+# A pair can only score on a rule if the two fields share an index token, so text candidates are read from
+# the posting lists instead of scanning the category. Tokens are tagged by field:
+#   c:<word>     color words (a shared color entry or a color inside the other one share a word)
+#   d:<word>     description words, the same ones the overlap rule counts
+#   l:<n-gram>   every run of up to MAX_NGRAM location words, looked up with the other item's full location
+#   L:<location> the full location, looked up with the other item's n-grams
+# so locations only meet when one can be inside the other ("Block A" and "Block A Room 101", not "Block B").
+# Words are split on any punctuation as well ("A-101" -> "a", "101"; "keys," -> "keys"), so a location inside a
+# hyphenated one or a word followed by a comma still meets. Description words are also indexed whole, the way the
+# overlap rule compares them.
+# Not found: substrings that cut through a word ("Lib" in "Library") or span more than MAX_NGRAM words.
+# Changing the tokens needs build_text_index.py to rewrite the postings.
+# One posting table per side keyed (category, token, date, item_id): a lookup reads only the postings of its
+# category and date window, without touching the item tables.
+# Rows are written with the item (routes/items.py); build_text_index.py fills them for existing databases.
+
+# Ignore common words in description overlap
+STOPWORDS = {'a', 'an', 'the', 'is', 'it', 'with', 'and', 'on', 'my'}
+MAX_NGRAM = 8
+
+# Colors are comma lists and locations free text; split both on whitespace and punctuation
+_SEPARATORS = re.compile(r"[\W_]+")
+
+_SIDES = {
+    'lost': (LostItem, LostItemToken, LostItem.location, LostItem.date_lost),
+    'found': (FoundItem, FoundItemToken, FoundItem.location_found, FoundItem.date_found),
+}
+
+def _words(text):
+    return [word for word in _SEPARATORS.split(text.lower()) if word] if text else []
+
+def _ngrams(words):
+    grams = set()
+    for start in range(len(words)):
+        for end in range(start + 1, min(start + MAX_NGRAM, len(words)) + 1):
+            if not set(words[start:end]) <= STOPWORDS:
+                grams.add(' '.join(words[start:end]))
+    return grams
+
+def _field_tokens(color, description):
+    tokens = {f"c:{word}" for word in _words(color) if word not in STOPWORDS}
+    if description:
+        words = set(description.lower().split()) | set(_words(description))
+        tokens.update(f"d:{word}" for word in words - STOPWORDS)
+    return tokens
+
+def tokens(color, location, description):
+    """An item's postings: color and description words, location n-grams and full location."""
+    words = _words(location)
+    tokens = _field_tokens(color, description) | {f"l:{gram}" for gram in _ngrams(words)}
+    if words:
+        tokens.add(f"L:{' '.join(words)}")
+    return tokens
+
+def query_tokens(color, location, description):
+    """What to look up for an item: same color and description words, location the other way round."""
+    words = _words(location)
+    tokens = _field_tokens(color, description) | {f"L:{gram}" for gram in _ngrams(words)}
+    if words:
+        tokens.add(f"l:{' '.join(words)}")
+    return tokens
+
+def item_tokens(item):
+    if isinstance(item, LostItem):
+        return tokens(item.color, item.location, item.description)
+    return tokens(item.color, item.location_found, item.description)
+
+def add(item):
+    """Writes the postings of a new item (flushed, so it has an id). Caller commits."""
+    if isinstance(item, LostItem):
+        token_model, day = LostItemToken, item.date_lost
+    else:
+        token_model, day = FoundItemToken, item.date_found
+    rows = [{"category": item.category, "token": token, "day": day, "item_id": item.id} for token in item_tokens(item)]
+    if rows:
+        db.session.execute(token_model.__table__.insert(), rows)
+
+def candidates(side, category, query, min_day=None, max_day=None):
+    """
+    Ids of the items of side ('lost' or 'found') in the category with a posting in query (see query_tokens()),
+    optionally within a date window.
+    """
+    token_model = _SIDES[side][1]
+    if not query:
+        return []
+    ids = select(token_model.item_id).where(
+        token_model.category == category,
+        token_model.token.in_(sorted(query))
+    ).distinct()
+    if min_day is not None:
+        ids = ids.where(token_model.day >= min_day)
+    if max_day is not None:
+        ids = ids.where(token_model.day <= max_day)
+    return db.session.execute(ids).scalars().all()
+
+def rows(side, ids):
+    """[(id, color, location, description, date)] of the side's items, in batches under SQLite's variable limit."""
+    model, _, location_column, date_column = _SIDES[side]
+    result = []
+    for start in range(0, len(ids), 500):
+        result.extend(db.session.query(model.id, model.color, location_column, model.description, date_column).filter(
+            model.id.in_(ids[start:start + 500])
+        ).all())
+    return result
+
+def rebuild(side, chunk_size=1000):
+    """Recreates the side's posting lists from its items. Commits. Returns (items, postings)."""
+    model, token_model, location_column, date_column = _SIDES[side]
+    db.session.query(token_model).delete()
+    items = postings = 0
+    last_id = 0
+    while True:
+        # Keyset pagination, only the indexed columns
+        rows = db.session.query(
+            model.id, model.category, model.color, location_column, model.description, date_column
+        ).filter(model.id > last_id).order_by(model.id).limit(chunk_size).all()
+        if not rows:
+            break
+        batch = [
+            {"category": category, "token": token, "day": day, "item_id": item_id}
+            for item_id, category, color, location, description, day in rows
+            for token in tokens(color, location, description)
+        ]
+        if batch:
+            db.session.execute(token_model.__table__.insert(), batch)
+        items += len(rows)
+        postings += len(batch)
+        last_id = rows[-1][0]
+    db.session.commit()
+    return items, postings
@@ -0,0 +1,416 @@
+from abc import ABC, abstractmethod
+import os
+import json
+import threading
+import time
+import numpy as np
+
+try:
+    import fcntl
+except ImportError: # Windows: single-process use only
+    fcntl = None
+
+# Where item vectors live. vector_utils talks to a VectorStore and never to a backend directly.
+# Vector ids are '<item_id>:<n>' (one per image) and every vector's metadata carries item_id.
+
+def vector_id(item_id, n):
+    """Each image of an item is its own vector, keyed '<item_id>:<n>'."""
+    return f"{item_id}:{n}"
+
+def item_id_from_vector_id(vid):
+    # Vectors indexed before multi-image support are keyed by the bare item id
+    return int(str(vid).split(':', 1)[0])
+
+class VectorStore(ABC):
+    """Interface implemented by ChromaStore and LocalStore."""
+
+    @abstractmethod
+    def upsert(self, collection_name, ids, embeddings, metadatas):
+        pass
+
+    @abstractmethod
+    def get_items(self, collection_name, item_ids):
+        """Returns {item_id: [embedding, ...]}, skipping items that were never indexed."""
+
+    @abstractmethod
+    def query(self, collection_name, query_embeddings, n_results, where=None):
+        """Nearest vectors per query embedding: [[(vector_id, cosine similarity, metadata), ...], ...]"""
+
+    @abstractmethod
+    def delete_item(self, collection_name, item_id):
+        pass
+
+    @abstractmethod
+    def count(self, collection_name):
+        pass
+
+    @abstractmethod
+    def list_collections(self):
+        pass
+
+    @abstractmethod
+    def export(self, collection_name, batch_size=1000):
+        """Yields (ids, embeddings, metadatas) batches of the whole collection."""
+
+class ChromaStore(VectorStore):
+    """
+    ChromaDB PersistentClient collections (HNSW, cosine space).
+    Collection handles are opened once and reused; get_or_create_collection costs a metadata
+    round trip per call. The collection list is cached for a few seconds so partition lookups
+    don't list on every search; collections created by other processes show up after that.
+    """
+
+    LIST_TTL = 5.0 # seconds
+
+    def __init__(self, get_client):
+        self._get_client = get_client
+        self._handles = {}
+        self._names = None
+        self._names_at = 0.0
+        self._lock = threading.Lock()
+
+    def collection(self, collection_name):
+        handle = self._handles.get(collection_name)
+        if handle is None:
+            with self._lock:
+                handle = self._handles.get(collection_name)
+                if handle is None:
+                    handle = self._get_client().get_or_create_collection(
+                        name=collection_name,
+                        metadata={"hnsw:space": "cosine"} # Cosine similarity for CLIP
+                    )
+                    self._handles[collection_name] = handle
+                    if self._names is not None:
+                        self._names.add(collection_name)
+        return handle
+
+    def forget(self, collection_name=None):
+        """Drops cached handles, e.g. after a collection was deleted and recreated."""
+        with self._lock:
+            if collection_name is None:
+                self._handles.clear()
+            else:
+                self._handles.pop(collection_name, None)
+            self._names = None
+
+    def _run(self, collection_name, fn):
+        """Calls fn(collection), reopening the handle once if the collection was dropped and recreated elsewhere."""
+        try:
+            return fn(self.collection(collection_name))
+        except Exception as e:
+            # chromadb.errors.NotFoundError (InvalidCollectionException before 0.6)
+            if type(e).__name__ not in ('NotFoundError', 'InvalidCollectionException'):
+                raise
+            self.forget(collection_name)
+            return fn(self.collection(collection_name))
+
+    def upsert(self, collection_name, ids, embeddings, metadatas):
+        # upsert so a retried job doesn't fail on an id it already wrote
+        self._run(collection_name, lambda c: c.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas))
+
+    def get_items(self, collection_name, item_ids):
+        item_ids = [int(i) for i in item_ids]
+        found = {}
+        if not item_ids:
+            return found
+        where = {"item_id": item_ids[0]} if len(item_ids) == 1 else {"item_id": {"$in": item_ids}}
+        for existing in self._run(collection_name, lambda c: (
+            c.get(where=where, include=['embeddings']),
+            c.get(ids=[str(i) for i in item_ids], include=['embeddings']) # Legacy ids
+        )):
+            if existing.get('embeddings') is None:
+                continue
+            for vid, embedding in zip(existing['ids'], existing['embeddings']):
+                found.setdefault(item_id_from_vector_id(vid), []).append(embedding)
+        return found
+
+    def query(self, collection_name, query_embeddings, n_results, where=None):
+        query_args = {
+            "query_embeddings": list(query_embeddings),
+            "n_results": n_results,
+            "include": ['distances', 'metadatas']
+        }
+        if where:
+            query_args["where"] = where
+        results = self._run(collection_name, lambda c: c.query(**query_args))
+        # hnsw:space='cosine' returns cosine distance: 1 - cos(theta)
+        return [
+            [(vid, 1 - dist, meta) for vid, dist, meta in zip(ids, distances, metadatas)]
+            for ids, distances, metadatas in zip(results['ids'], results['distances'], results['metadatas'])
+        ]
+
+    def delete_item(self, collection_name, item_id):
+        def delete(collection):
+            collection.delete(where={"item_id": int(item_id)})
+            collection.delete(ids=[str(item_id)]) # Legacy single-vector id
+        self._run(collection_name, delete)
+
+    def count(self, collection_name):
+        return self._run(collection_name, lambda c: c.count())
+
+    def list_collections(self):
+        with self._lock:
+            if self._names is None or time.monotonic() - self._names_at > self.LIST_TTL:
+                # chromadb < 0.6 returns Collection objects, later versions return names
+                self._names = {c if isinstance(c, str) else c.name for c in self._get_client().list_collections()}
+                self._names_at = time.monotonic()
+            return list(self._names)
+
+    def export(self, collection_name, batch_size=1000):
+        collection = self.collection(collection_name)
+        offset = 0
+        while True:
+            batch = collection.get(limit=batch_size, offset=offset, include=['embeddings', 'metadatas'])
+            if not batch['ids']:
+                return
+            yield batch['ids'], [list(e) for e in batch['embeddings']], batch['metadatas']
+            offset += len(batch['ids'])
+
+class _LocalCollection:
+    """
+    One collection on disk:
+      vectors.f32  row-major float32 matrix of unit vectors, memory-mapped for queries
+      log.jsonl    append-only record of which id/metadata lives in which row, replayed on open
+    A row is only visible once its log line is written, so a crash mid-upsert leaves nothing half-indexed.
+    Other processes' writes are picked up by replaying the log from the last offset.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, 'vectors.f32')
+        self._log_path = os.path.join(path, 'log.jsonl')
+        self._lock_path = os.path.join(path, '.lock')
+        self._lock = threading.RLock()
+        self.dim = None
+        self.rows = {} # vector id -> row
+        self.ids = [] # row -> vector id, None once deleted
+        self.metadatas = []
+        self._by_item = {} # item_id -> set of rows
+        self._log_offset = 0
+        self._matrix = None
+        self._columns = {}
+
+    def _file_lock(self):
+        return _FileLock(self._lock_path)
+
+    def refresh(self):
+        """Replays log lines written since the last call (by this or another process)."""
+        with self._lock:
+            if not os.path.exists(self._log_path) or os.path.getsize(self._log_path) == self._log_offset:
+                return
+            # Copy on write: queries keep using the lists they snapshotted
+            self.ids = list(self.ids)
+            self.metadatas = list(self.metadatas)
+            with open(self._log_path, 'rb') as f:
+                f.seek(self._log_offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break # Partially written line, read it next time
+                    self._log_offset += len(line)
+                    self._apply(json.loads(line))
+            self._matrix = None
+            self._columns = {}
+
+    def _apply(self, record):
+        if record.get('op') == 'init':
+            self.dim = record['dim']
+            return
+        vid = record['id']
+        old_row = self.rows.pop(vid, None)
+        if old_row is not None:
+            self.ids[old_row] = None
+            self._by_item.get(item_id_from_vector_id(vid), set()).discard(old_row)
+        if record['op'] == 'put':
+            row = record['row']
+            while len(self.ids) <= row:
+                self.ids.append(None)
+                self.metadatas.append(None)
+            self.ids[row] = vid
+            self.metadatas[row] = record['metadata']
+            self.rows[vid] = row
+            self._by_item.setdefault(item_id_from_vector_id(vid), set()).add(row)
+
+    def matrix(self):
+        with self._lock:
+            if self._matrix is None:
+                n = len(self.ids)
+                if n == 0 or self.dim is None:
+                    self._matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+                else:
+                    self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode='r', shape=(n, self.dim))
+            return self._matrix
+
+    def valid(self):
+        """Rows that hold a live vector."""
+        with self._lock:
+            mask = self._columns.get(None)
+            if mask is None:
+                mask = np.array([vid is not None for vid in self.ids], dtype=bool)
+                self._columns[None] = mask
+            return mask
+
+    def column(self, key):
+        """Metadata values of every row as an array, for vectorized where filters."""
+        with self._lock:
+            col = self._columns.get(key)
+            if col is None:
+                col = np.array([m.get(key) if m else None for m in self.metadatas], dtype=object)
+                self._columns[key] = col
+            return col
+
+    def upsert(self, ids, embeddings, metadatas):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        with self._lock, self._file_lock():
+            self.refresh()
+            records = []
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                records.append({"op": "init", "dim": self.dim})
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-d vectors, got {vectors.shape[1]}")
+            next_row = len(self.ids)
+            with open(self._vectors_path, 'r+b' if os.path.exists(self._vectors_path) else 'w+b') as f:
+                for vid, vector, metadata in zip(ids, vectors, metadatas):
+                    row = self.rows.get(vid)
+                    if row is None:
+                        row, next_row = next_row, next_row + 1
+                    f.seek(row * self.dim * 4)
+                    f.write(vector.tobytes())
+                    records.append({"op": "put", "id": vid, "row": row, "metadata": metadata})
+                f.flush()
+                os.fsync(f.fileno())
+            self._append_log(records)
+            self.refresh()
+
+    def delete(self, vids):
+        vids = [v for v in vids if v in self.rows]
+        if not vids:
+            return
+        with self._lock, self._file_lock():
+            self._append_log([{"op": "delete", "id": vid} for vid in vids])
+            self.refresh()
+
+    def _append_log(self, records):
+        with open(self._log_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(r) + '\n' for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+class _FileLock:
+    """Serializes writers across processes (gunicorn workers, reindex scripts)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+class LocalStore(VectorStore):
+    """
+    Process-local exact index: brute-force cosine over a memory-mapped matrix.
+    No separate server or metadata database, and recall is exact. Fine up to a few
+    hundred thousand vectors per collection; beyond that an ANN index pays off.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def collection(self, collection_name):
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            with self._lock:
+                collection = self._collections.get(collection_name)
+                if collection is None:
+                    collection = _LocalCollection(os.path.join(self.path, collection_name))
+                    self._collections[collection_name] = collection
+        collection.refresh()
+        return collection
+
+    def upsert(self, collection_name, ids, embeddings, metadatas):
+        self.collection(collection_name).upsert(ids, embeddings, metadatas)
+
+    def get_items(self, collection_name, item_ids):
+        collection = self.collection(collection_name)
+        found = {}
+        with collection._lock:
+            matrix = collection.matrix()
+            for item_id in item_ids:
+                rows = sorted(collection._by_item.get(int(item_id), ()))
+                if rows:
+                    found[int(item_id)] = matrix[rows].tolist()
+        return found
+
+    def query(self, collection_name, query_embeddings, n_results, where=None):
+        collection = self.collection(collection_name)
+        with collection._lock:
+            matrix, ids, metadatas = collection.matrix(), collection.ids, collection.metadatas
+            mask = collection.valid()
+            if where:
+                mask = mask & self._where_mask(collection, where)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if len(ids) == 0 or not mask.any():
+            return [[] for _ in queries]
+
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        candidates = np.flatnonzero(mask)
+        similarities = np.asarray(matrix[candidates] @ queries.T).T # (queries, candidates)
+        k = min(n_results, len(candidates))
+        results = []
+        for sims in similarities:
+            top = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+            top = top[np.argsort(-sims[top])]
+            results.append([(ids[candidates[i]], float(sims[i]), metadatas[candidates[i]]) for i in top])
+        return results
+
+    def _where_mask(self, collection, where):
+        """The subset of Chroma's where syntax we use: equality, $eq, $in, $and."""
+        mask = np.ones(len(collection.ids), dtype=bool)
+        for key, condition in where.items():
+            if key == '$and':
+                for c in condition:
+                    mask &= self._where_mask(collection, c)
+            elif isinstance(condition, dict) and '$in' in condition:
+                mask &= np.isin(collection.column(key), np.array(condition['$in'], dtype=object))
+            elif isinstance(condition, dict) and '$eq' in condition:
+                mask &= collection.column(key) == condition['$eq']
+            elif isinstance(condition, dict):
+                raise ValueError(f"Unsupported where operator for {key}: {condition}")
+            else:
+                mask &= collection.column(key) == condition
+        return mask
+
+    def delete_item(self, collection_name, item_id):
+        collection = self.collection(collection_name)
+        with collection._lock:
+            vids = [collection.ids[row] for row in collection._by_item.get(int(item_id), ())]
+        collection.delete(vids)
+
+    def count(self, collection_name):
+        return len(self.collection(collection_name).rows)
+
+    def list_collections(self):
+        if not os.path.isdir(self.path):
+            return []
+        return [name for name in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, name))]
+
+    def export(self, collection_name, batch_size=1000):
+        collection = self.collection(collection_name)
+        with collection._lock:
+            rows = sorted(collection.rows.values())
+            matrix = collection.matrix()
+            for start in range(0, len(rows), batch_size):
+                chunk = rows[start:start + batch_size]
+                yield [collection.ids[r] for r in chunk], matrix[chunk].tolist(), [collection.metadatas[r] for r in chunk]
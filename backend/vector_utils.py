@@ -1,173 +1,528 @@
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 from PIL import Image
 import os
-import io
+import re
 import base64
 import numpy as np
 import threading
+import queue
+import time
+from concurrent.futures import Future
+from config import Config
+from vector_store import vector_id, item_id_from_vector_id
+import vector_store
+import embedding_backends
+import image_preprocess
+import image_store
+import embedding_cache
 
-# Global variables for model and client
-_model = None
-_client = None
-_lock = threading.Lock()
+# chromadb and sentence_transformers (which pulls in torch) take seconds to import, so they are
+# imported on first use (here and in embedding_backends). Admin scripts and workers that never touch vectors don't pay for them.
+
+# Encode throughput counters, see get_stats()
+_stats = {"images": 0, "calls": 0, "seconds": 0.0}
+_stats_lock = threading.Lock()
+
+class VectorSession:
+    """
+    Process-wide handles of the vector layer: the CLIP model (image and text), the Chroma client and the vector store.
+    Each is created once under its own lock (loading the model doesn't hold up the client)
+    and read without locking afterwards.
+    """
+
+    def __init__(self):
+        self._model = None
+        self._text_model = None
+        self._client = None
+        self._store = None
+        self._model_lock = threading.Lock()
+        self._client_lock = threading.Lock()
+        self._store_lock = threading.Lock()
+
+    def model(self):
+        """Lazy load the model to avoid high memory usage on startup if not needed immediately"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    print(f"Loading CLIP model ({Config.EMBED_BACKEND})...")
+                    self._model = embedding_backends.load()
+                    print("CLIP model loaded.")
+        return self._model
+
+    def text_model(self):
+        """CLIP's text tower: the image model itself unless the image backend is ONNX (see embedding_backends.load_text)."""
+        if self._text_model is None:
+            image_model = self.model()
+            with self._model_lock:
+                if self._text_model is None:
+                    self._text_model = embedding_backends.load_text(image_model)
+        return self._text_model
+
+    def client(self):
+        """Lazy load ChromaDB client"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import chromadb
+                    print("Initializing ChromaDB client...")
+                    # Persistent storage in ./chroma_db relative to this file
+                    backend_dir = os.path.dirname(os.path.abspath(__file__))
+                    persist_path = os.path.join(backend_dir, 'chroma_db')
+                    self._client = chromadb.PersistentClient(path=persist_path)
+                    print("ChromaDB client initialized.")
+        return self._client
+
+    def store(self):
+        """The configured VectorStore: 'chroma' (default) or 'local' (see vector_store.py)."""
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    if Config.VECTOR_STORE == 'local':
+                        self._store = vector_store.LocalStore(Config.VECTOR_STORE_PATH)
+                    else:
+                        self._store = vector_store.ChromaStore(self.client)
+        return self._store
+
+    def warm_up(self, collections=("lost_items", "found_items", "lost_text", "found_text"), model=True):
+        """Loads the model and opens every collection (and partition) now instead of on the first request."""
+        start = time.perf_counter()
+        if model:
+            self.model()
+        store = self.store()
+        for name in collections:
+            for partition in partitions(name) or [name]:
+                store.collection(partition)
+        print(f"Vector layer warmed up in {time.perf_counter() - start:.1f}s.")
+
+_session = VectorSession()
 
 def get_model():
-    """Lazy load the model to avoid high memory usage on startup if not needed immediately"""
-    global _model
-    with _lock:
-        if _model is None:
-            print("Loading CLIP model...")
-            # using 'clip-ViT-B-32' for good balance of speed/performance
-            _model = SentenceTransformer('clip-ViT-B-32')
-            print("CLIP model loaded.")
-    return _model
+    return _session.model()
+
+def get_text_model():
+    return _session.text_model()
 
 def get_client():
-    """Lazy load ChromaDB client"""
-    global _client
-    with _lock:
-        if _client is None:
-            print("Initializing ChromaDB client...")
-            # Persistent storage in ./chroma_db relative to this file
-            backend_dir = os.path.dirname(os.path.abspath(__file__))
-            persist_path = os.path.join(backend_dir, 'chroma_db')
-            _client = chromadb.PersistentClient(path=persist_path)
-            print("ChromaDB client initialized.")
-    return _client
+    return _session.client()
 
-def get_embedding(image_data):
+def get_store():
+    return _session.store()
+
+def warm_up(model=True):
+    _session.warm_up(model=model)
+
+def _image_source(image_data):
     """
-    Generates a vector embedding for an image.
+    Resolves image_data (see load_image) to something image_preprocess can open, plus its
+    embedding cache key when the content hash is known without decoding.
+    Returns (None, None) if it can't be parsed.
+    """
+    if isinstance(image_data, str):
+        # Check if it's a base64 string
+        if image_data.startswith('data:image') or ';base64,' in image_data:
+            # Remove header if present
+            if ',' in image_data:
+                header, encoded = image_data.split(',', 1)
+            else:
+                encoded = image_data
+            
+            img_bytes = base64.b64decode(encoded)
+            return img_bytes, embedding_cache.key_for_bytes(img_bytes)
+        # Check if it's a file path
+        elif os.path.exists(image_data):
+            name = os.path.basename(image_data)
+            if image_store.is_hash(name):
+                # image_store files are named by the SHA-256 of their bytes already
+                return image_data, name
+            with open(image_data, 'rb') as f:
+                img_bytes = f.read()
+            return img_bytes, embedding_cache.key_for_bytes(img_bytes)
+        else:
+            # Might be raw base64 without header?
+            try:
+                img_bytes = base64.b64decode(image_data)
+                return img_bytes, embedding_cache.key_for_bytes(img_bytes)
+            except:
+                print(f"Error: Could not parse image string: {image_data[:50]}...")
+                return None, None
+    elif isinstance(image_data, Image.Image):
+        return image_data, None
+    return None, None
+
+def _prepare(source):
+    # Decode here, in the caller's thread, so batched encodes only pay for the model
+    return image_preprocess.prepare(
+        source,
+        short_side=Config.EMBED_IMAGE_SIZE,
+        max_side=Config.EMBED_IMAGE_MAX_SIDE,
+        purpose='embedding'
+    )
+
+def load_image(image_data):
+    """
+    Decodes an image for encoding.
     image_data: can be a file path (str), a PIL Image object, 
                 or a base64 encoded string (with or without 'data:image...').
+    Returns an RGB PIL Image already shrunk to the encoder's input size, or None if it can't be read.
     """
     try:
-        model = get_model()
-        img = None
-
-        if isinstance(image_data, str):
-            # Check if it's a base64 string
-            if image_data.startswith('data:image') or ';base64,' in image_data:
-                # Remove header if present
-                if ',' in image_data:
-                    header, encoded = image_data.split(',', 1)
-                else:
-                    encoded = image_data
-                
-                img_bytes = base64.b64decode(encoded)
-                img = Image.open(io.BytesIO(img_bytes))
-            # Check if it's a file path
-            elif os.path.exists(image_data):
-                img = Image.open(image_data)
-            else:
-                # Might be raw base64 without header?
+        source, _ = _image_source(image_data)
+        return _prepare(source) if source is not None else None
+    except Exception as e:
+        print(f"Error loading image: {e}")
+        return None
+
+def _load_uncached(images, keys=None):
+    """
+    Looks every image up in the embedding cache and decodes only the misses.
+    keys: content keys aligned with images, when the caller already knows them
+    Returns (results, pending): cached embeddings aligned with images (None elsewhere)
+    and [(index, decoded image, cache key)] still to encode.
+    """
+    sources = []
+    for n, image_data in enumerate(images):
+        try:
+            source, key = _image_source(image_data)
+        except Exception as e:
+            print(f"Error loading image: {e}")
+            source, key = None, None
+        sources.append((source, keys[n] if keys else key))
+    cached = embedding_cache.get_many(key for _, key in sources)
+
+    results = [None] * len(images)
+    pending = []
+    for i, (source, key) in enumerate(sources):
+        if key in cached:
+            results[i] = cached[key].tolist()
+            continue
+        if source is None:
+            continue
+        try:
+            img = _prepare(source)
+        except Exception as e:
+            print(f"Error loading image: {e}")
+            continue
+        if key is None:
+            # In-memory image: only its pixels identify it
+            key = embedding_cache.key_for_image(img)
+            hit = embedding_cache.get(key)
+            if hit is not None:
+                results[i] = hit.tolist()
+                continue
+        pending.append((i, img, key))
+    return results, pending
+
+def _record_encode(n_images, seconds):
+    with _stats_lock:
+        _stats["images"] += n_images
+        _stats["calls"] += 1
+        _stats["seconds"] += seconds
+
+def get_stats():
+    """Encode throughput since startup, across single, bulk and micro-batched calls."""
+    with _stats_lock:
+        images, calls, seconds = _stats["images"], _stats["calls"], _stats["seconds"]
+    return {
+        "images_encoded": images,
+        "encode_calls": calls,
+        "avg_batch_size": round(images / calls, 2) if calls else 0,
+        "images_per_sec": round(images / seconds, 2) if seconds else 0,
+        "backend": Config.EMBED_BACKEND
+    }
+
+class MicroBatcher:
+    """
+    Gathers encode requests from concurrent threads (the embedding job workers) for up to max_wait_ms
+    and runs them as one model.encode([...]) call.
+    get_model: the model to encode with (the image model, or the text model for texts)
+    record: count the encodes in get_stats() (image throughput only)
+    """
+
+    def __init__(self, get_model, max_batch_size=16, max_wait_ms=5, name="clip-microbatcher", record=True):
+        self.get_model = get_model
+        self.record = record
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def encode(self, item):
+        """Blocks until the batch containing item has been encoded, returns its vector."""
+        return self.encode_many([item])[0]
+
+    def encode_many(self, items):
+        """Queues every item (they may land in different batches) and returns their vectors in order."""
+        self._ensure_started()
+        futures = []
+        for item in items:
+            future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
                 try:
-                    img_bytes = base64.b64decode(image_data)
-                    img = Image.open(io.BytesIO(img_bytes))
-                except:
-                    print(f"Error: Could not parse image string: {image_data[:50]}...")
-                    return None
-        elif isinstance(image_data, Image.Image):
-            img = image_data
-        
-        if img:
-            # Generate embedding
-            embedding = model.encode(img)
-            return embedding.tolist()
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                model = self.get_model()
+                start = time.perf_counter()
+                vectors = model.encode([item for item, _ in batch], batch_size=len(batch))
+                if self.record:
+                    _record_encode(len(batch), time.perf_counter() - start)
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+_batcher = MicroBatcher(
+    get_model,
+    max_batch_size=Config.EMBED_MICROBATCH_SIZE,
+    max_wait_ms=Config.EMBED_MICROBATCH_WAIT_MS
+)
+_text_batcher = MicroBatcher(
+    get_text_model,
+    max_batch_size=Config.EMBED_MICROBATCH_SIZE,
+    max_wait_ms=Config.EMBED_MICROBATCH_WAIT_MS,
+    name="clip-text-microbatcher",
+    record=False
+)
+
+def _encode(batcher, model, items, batch_size):
+    """
+    Encodes items through the micro-batcher when they fit in one of its batches (a job's images or text),
+    so concurrent jobs share encode calls; larger backfill batches go to the model directly.
+    """
+    if Config.EMBED_MICROBATCH_ENABLED and len(items) <= batcher.max_batch_size:
+        return batcher.encode_many(items)
+    start = time.perf_counter()
+    vectors = model().encode(items, batch_size=batch_size)
+    if batcher.record:
+        _record_encode(len(items), time.perf_counter() - start)
+    return vectors
+
+def get_embedding(image_data):
+    """
+    Generates a vector embedding for an image.
+    Served from the embedding cache when the same content was encoded before;
+    otherwise concurrent callers are coalesced into one batch by the micro-batcher.
+    """
+    try:
+        results, pending = _load_uncached([image_data])
+        if not pending:
+            return results[0]
+        _, img, key = pending[0]
+        embedding = _encode(_batcher, get_model, [img], 1)[0]
+        embedding_cache.put_many({key: embedding})
+        return embedding.tolist()
             
     except Exception as e:
         print(f"Error generating embedding: {e}")
         return None
 
-def get_collection(collection_name):
-    client = get_client()
-    # get_or_create_collection returns a collection object
-    return client.get_or_create_collection(
-        name=collection_name, 
-        metadata={"hnsw:space": "cosine"} # Cosine similarity for CLIP
-    )
-
-def add_to_collection(collection_name, item_id, embedding, metadata):
+def get_embeddings(images, batch_size=None, keys=None):
     """
-    Adds an item to the specified collection.
-    item_id: str or int (will be converted to str)
-    embedding: list of floats
-    metadata: dict
+    Bulk version of get_embedding for backfills and multi-image uploads.
+    keys: optional content hashes aligned with images (e.g. image_store hashes of decoded images)
+    Returns a list aligned with images, with None where an image couldn't be read.
     """
-    if embedding is None:
-        print("Skipping vector add: No embedding provided.")
-        return False
+    batch_size = batch_size or Config.EMBED_BATCH_SIZE
+    results, pending = _load_uncached(images, keys)
+    if not pending:
+        return results
 
     try:
-        collection = get_collection(collection_name)
-        collection.add(
-            ids=[str(item_id)],
-            embeddings=[embedding],
-            metadatas=[metadata]
-        )
-        return True
+        vectors = _encode(_batcher, get_model, [img for _, img, _ in pending], batch_size)
+        for (i, _, _), vector in zip(pending, vectors):
+            results[i] = vector.tolist()
+        embedding_cache.put_many({key: vector for (_, _, key), vector in zip(pending, vectors)})
     except Exception as e:
-        print(f"Error adding to collection {collection_name}: {e}")
-        return False
+        print(f"Error generating embeddings: {e}")
+    return results
 
-def search_collection(collection_name, query_embedding, n_results=5, threshold=0.1, where=None):
+def get_text_embeddings(texts, batch_size=None):
     """
-    Searches for similar items in the collection.
-    threshold: Minimum similarity score (0 to 1, where 1 is identical)
-    where: Optional metadata filter for ChromaDB (e.g. {"category": "Electronics"})
+    CLIP text embeddings for item texts (see jobs.item_text), aligned with texts; None for empty ones.
+    Cached like image embeddings, by the hash of the text.
     """
-    if query_embedding is None:
-        return []
+    batch_size = batch_size or Config.EMBED_BATCH_SIZE
+    keys = [embedding_cache.key_for_text(text) if text else None for text in texts]
+    cached = embedding_cache.get_many(keys)
+    results = [cached[key].tolist() if key in cached else None for key in keys]
+    # One encode per distinct text
+    pending = {key: text for key, text in zip(keys, texts) if key and key not in cached}
+    if not pending:
+        return results
 
     try:
-        collection = get_collection(collection_name)
-        
-        query_args = {
-            "query_embeddings": [query_embedding],
-            "n_results": n_results
-        }
-        if where:
-            query_args["where"] = where
-
-        results = collection.query(**query_args)
-        
-        matches = []
-        if results['ids'] and len(results['ids']) > 0:
-            ids = results['ids'][0]
-            distances = results['distances'][0]
-            metadatas = results['metadatas'][0]
-            
-            for i, dist in enumerate(distances):
-                # Convert cosine distance to similarity score
-                # distance matches exactly what we set in metadata?
-                # Actually, hnsw:space='cosine' returns cosine distance: 1 - cos(theta)
-                similarity = 1 - dist
-                
-                # Filter by threshold (e.g. 0.6 or 0.7 for "somewhat similar")
-                # The user prompt said "match above some threshold"
-                # Let's assume passed threshold is similarity (high is good)
-                
-                if similarity >= threshold:
-                    matches.append({
-                        "id": ids[i],
-                        "metadata": metadatas[i],
-                        "score": similarity,
-                        "distance": dist
-                    })
-                    
-        return matches
-
+        vectors = dict(zip(pending, _encode(_text_batcher, get_text_model, list(pending.values()), batch_size)))
+        for i, key in enumerate(keys):
+            if key in vectors:
+                results[i] = vectors[key].tolist()
+        embedding_cache.put_many(vectors)
     except Exception as e:
-        print(f"Error searching collection {collection_name}: {e}")
-        return []
+        print(f"Error generating text embeddings: {e}")
+    return results
+
+def month_key(day):
+    """Partition key of a date under VECTOR_PARTITION='category_month', e.g. '2026-01'."""
+    return day.strftime('%Y-%m') if day else None
+
+def _slug(value):
+    # Collection names only allow [a-zA-Z0-9._-]
+    return re.sub(r'[^a-z0-9]+', '-', str(value or '').lower()).strip('-') or 'none'
+
+def partition_name(collection_name, metadata):
+    """Physical collection for a vector with this metadata under the configured VECTOR_PARTITION."""
+    if not Config.VECTOR_PARTITION:
+        return collection_name
+    name = f"{collection_name}__{_slug(metadata.get('category'))}"
+    if Config.VECTOR_PARTITION == 'category_month':
+        name += f"__{metadata.get('month') or 'none'}"
+    return name
+
+def partitions(collection_name, category=None, month_from=None, month_to=None):
+    """
+    Physical collections a lookup or search has to visit. With a category only its partitions
+    are returned; month_from/month_to ('YYYY-MM', inclusive) narrow month partitions further.
+    """
+    if not Config.VECTOR_PARTITION:
+        return [collection_name]
+    prefix = f"{collection_name}__"
+    if category is not None:
+        prefix += _slug(category)
+        if Config.VECTOR_PARTITION == 'category':
+            return [prefix] if prefix in get_store().list_collections() else []
+        prefix += "__"
+    names = []
+    for name in get_store().list_collections():
+        if not name.startswith(prefix):
+            continue
+        month = name.rsplit('__', 1)[1] if Config.VECTOR_PARTITION == 'category_month' else None
+        if month and month != 'none':
+            if (month_from and month < month_from) or (month_to and month > month_to):
+                continue
+        names.append(name)
+    return names
+
+def _split_where(where):
+    """Pulls the category out of a where filter; partitioning already answers it."""
+    if not Config.VECTOR_PARTITION or not where or not isinstance(where.get('category'), str):
+        return None, where
+    rest = {k: v for k, v in where.items() if k != 'category'}
+    return where['category'], rest or None
 
 def delete_from_collection(collection_name, item_id):
+    """Removes every vector belonging to an item."""
     try:
-        collection = get_collection(collection_name)
-        collection.delete(ids=[str(item_id)])
+        for name in partitions(collection_name):
+            get_store().delete_item(name, item_id)
         return True
     except Exception as e:
         print(f"Error deleting from collection {collection_name}: {e}")
         return False
+
+def add_item_vectors(collection_name, item_id, embeddings, metadata):
+    """
+    Indexes all images of an item in one upsert.
+    embeddings: list aligned with the item's images, None entries are skipped
+    metadata: category (and month, for month partitions) also pick the partition
+    Returns the number of vectors written, or None on error.
+    """
+    ids, vectors = [], []
+    for n, embedding in enumerate(embeddings):
+        if embedding is not None:
+            ids.append(vector_id(item_id, n))
+            vectors.append(embedding)
+    if not ids:
+        return 0
+
+    try:
+        get_store().upsert(
+            partition_name(collection_name, metadata),
+            ids, vectors, [dict(metadata, item_id=int(item_id)) for _ in ids]
+        )
+        return len(ids)
+    except Exception as e:
+        print(f"Error adding to collection {collection_name}: {e}")
+        return None
+
+def get_item_embeddings(collection_name, item_ids, category=None, month=None):
+    """
+    Returns {item_id: [embedding, ...]} for the given items, skipping items that were never indexed.
+    category/month: where the items live, so only their partition is read
+    """
+    found = {}
+    try:
+        for name in partitions(collection_name, category, month, month):
+            for item_id, embeddings in get_store().get_items(name, item_ids).items():
+                found.setdefault(item_id, []).extend(embeddings)
+    except Exception as e:
+        print(f"Error fetching embeddings from {collection_name}: {e}")
+    return found
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def search_items(collection_name, query_embeddings, n_results=5, threshold=0.1, where=None, aggregate='max',
+                 month_from=None, month_to=None):
+    """
+    Multi-vector search. All query embeddings go out in one batched query per partition, then
+    every candidate item is scored over all (query image, item image) pairs.
+    aggregate: 'max' (best pair) or 'mean' (average over all pairs)
+    month_from/month_to: skip month partitions outside this range (ignored otherwise)
+    Returns {item_id: similarity} for the top n_results items at or above threshold.
+    """
+    if not query_embeddings:
+        return {}
+
+    try:
+        store = get_store()
+        category, where = _split_where(where)
+        # {partition: candidate item ids}
+        candidates = {}
+        for name in partitions(collection_name, category, month_from, month_to):
+            # Items have several vectors, over-fetch so n_results distinct items survive
+            results = store.query(name, query_embeddings, n_results * 3, where=where)
+            ids = {item_id_from_vector_id(vid) for hits in results for vid, _, _ in hits}
+            if ids:
+                candidates[name] = ids
+        if not candidates:
+            return {}
+
+        queries = _normalize(query_embeddings)
+        scores = {}
+        for name, ids in candidates.items():
+            for item_id, vectors in store.get_items(name, ids).items():
+                similarities = queries @ _normalize(vectors).T
+                score = similarities.mean() if aggregate == 'mean' else similarities.max()
+                if score >= threshold:
+                    scores[item_id] = float(score)
+
+        best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:n_results]
+        return dict(best)
+
+    except Exception as e:
+        print(f"Error searching collection {collection_name}: {e}")
+        return {}
@@ -323,6 +323,26 @@ function UserNotifications() {
     const navigate = useNavigate();
 
     React.useEffect(() => {
+        let source = null;
+        let pollTimer = null;
+        let closed = false;
+
+        // New matches are pushed when the server advertises its stream; EventSource can't send headers, so the token goes in the URL
+        const subscribe = (data) => {
+            if (source || closed) return;
+            const token = localStorage.getItem('token');
+            // The stream starts after the newest match we already have, so none is missed in between
+            const after = data.length ? Math.max(...data.map(n => n.id)) : 0;
+            source = new EventSource(`/api/items/notifications/stream?jwt=${encodeURIComponent(token)}&after=${after}`);
+            source.addEventListener('match', (e) => {
+                const match = JSON.parse(e.data);
+                setNotifications(prev => [match, ...prev.filter(n => n.id !== match.id)]);
+            });
+            // Sent when events were dropped; reconnects resume from the last event id on their own
+            source.addEventListener('resync', fetchNotifications);
+            clearInterval(pollTimer);
+        };
+
         const fetchNotifications = async () => {
             try {
                 const token = localStorage.getItem('token');
@@ -340,6 +360,9 @@ function UserNotifications() {
                 if (response.ok) {
                     const data = await response.json();
                     setNotifications(data);
+                    if (response.headers.get('X-Notification-Stream') === '1') {
+                        subscribe(data);
+                    }
                 } else if (response.status === 401 || response.status === 422) {
                     localStorage.removeItem('token');
                     localStorage.removeItem('user');
@@ -356,6 +379,13 @@ function UserNotifications() {
         };
 
         fetchNotifications();
+        // Without the stream, poll: the server caches the list and answers an unchanged one with a 304
+        pollTimer = setInterval(fetchNotifications, 30000);
+        return () => {
+            closed = true;
+            clearInterval(pollTimer);
+            if (source) source.close();
+        };
     }, []);
 
     if (loading) return <div className="text-text-muted text-center py-4">Checking for matches...</div>;
@@ -26,6 +26,8 @@ export default function MatchDetail() {
     // Helper to extract image URL (handling list string or simple string)
     const getImageUrl = (imgData) => {
         if (!imgData) return null;
+        // Current API: list of image URLs
+        if (Array.isArray(imgData)) return imgData[0] || null;
         try {
             // Check if it's a string representation of a list e.g. "['data:image...', '...']"
             if (imgData.startsWith("['") || imgData.startsWith('["')) {